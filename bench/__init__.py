@@ -0,0 +1,8 @@
+"""
+Benchmarks for ondo, see `python -m bench --help`.
+
+- `corpus` generates leaky listings and posts of whatever size we want
+- `leaky` serves a corpus over HTTP with injectable latency
+- `load` drives the page routes in-process and reports latency percentiles
+- `micro` times the listing parsers and `parse_date`
+"""
@@ -0,0 +1,139 @@
+"""
+Benchmarks for ondo against a generated leaky corpus.
+
+    python -m bench [micro|load|all] [--posts 10000 --images 50000 ...]
+    python -m bench compare before.json after.json
+
+Results are written as JSON (to `bench/results/` by default) so runs from
+before and after a change can be compared.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from .corpus import Corpus
+from .load import LoadOptions, run_load
+from .micro import run_micro
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Per benchmark numbers worth comparing, lower is better for all of them
+# except throughput
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "best_ms")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> int:
+    corpus = Corpus(
+        posts=args.posts,
+        images=args.images,
+        tracks=args.tracks,
+        body_size=args.body_size,
+    )
+    results: Dict[str, Any] = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "corpus": corpus.describe(),
+        }
+    }
+
+    if args.suite in ("micro", "all"):
+        results["micro"] = run_micro(corpus, repeat=args.repeat)
+
+    if args.suite in ("load", "all"):
+        options = LoadOptions(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            latency=args.latency,
+            jitter=args.jitter,
+            only=args.only,
+        )
+        results["meta"]["load"] = vars(options)
+        results["load"] = asyncio.run(run_load(corpus, options))
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.suite}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {out}")
+    return 0
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    flat = {}
+    for suite in ("micro", "load"):
+        for name, numbers in results.get(suite, {}).items():
+            for key in COMPARED:
+                if key in numbers:
+                    flat[f"{suite} {name} {key}"] = numbers[key]
+    return flat
+
+
+def compare(before_path: str, after_path: str) -> int:
+    with open(before_path) as f:
+        before = flatten(json.load(f))
+    with open(after_path) as f:
+        after = flatten(json.load(f))
+
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{key}: {old} -> {new} ({change:+.1f}%)")
+    return 0
+
+
+def main(argv: List[str]) -> int:
+    if argv[:1] == ["compare"]:
+        if len(argv) != 3:
+            print("usage: python -m bench compare before.json after.json")
+            return 1
+        return compare(argv[1], argv[2])
+
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument(
+        "suite", nargs="?", default="all", choices=("micro", "load", "all")
+    )
+    parser.add_argument("--posts", type=int, default=Corpus.posts)
+    parser.add_argument("--images", type=int, default=Corpus.images)
+    parser.add_argument("--tracks", type=int, default=Corpus.tracks)
+    parser.add_argument("--body-size", type=int, default=Corpus.body_size)
+    parser.add_argument("--repeat", type=int, default=5, help="micro repetitions")
+    parser.add_argument("--requests", type=int, default=LoadOptions.requests)
+    parser.add_argument("--concurrency", type=int, default=LoadOptions.concurrency)
+    parser.add_argument("--warmup", type=int, default=LoadOptions.warmup)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds leaky takes to respond"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--only", nargs="*", help="only load test endpoints containing these"
+    )
+    parser.add_argument("--out", help="where to write results")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,133 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Any, Dict, List
+
+# Spread entries out so they sort differently within a day, not just by date
+START = datetime(2020, 1, 1)
+STEP = timedelta(minutes=37)
+
+
+def leaky_date(when: datetime) -> List[int]:
+    """A timestamp the way leaky writes them, [year, ordinal day, h, m, s, ns, ...]"""
+    return [
+        when.year,
+        when.timetuple().tm_yday,
+        when.hour,
+        when.minute,
+        when.second,
+        when.microsecond * 1000,
+        0,
+        0,
+        0,
+    ]
+
+
+def fake_cid(kind: str, i: int, version: int = 0) -> str:
+    return "bafy" + hashlib.sha1(f"{kind}{i}@{version}".encode()).hexdigest()
+
+
+@dataclass
+class Corpus:
+    """
+    A made up leaky: `posts` blog posts over `categories` categories, `images`
+    gallery images and `tracks` tracks. Posts render to about `body_size` bytes.
+    """
+
+    posts: int = 1000
+    images: int = 5000
+    tracks: int = 100
+    categories: int = 8
+    body_size: int = 20_000
+    # Bumped to simulate new content, changes every CID
+    version: int = 0
+
+    def post_path(self, i: int) -> str:
+        return f"/category{i % self.categories}/post-{i}.md"
+
+    def image_path(self, i: int) -> str:
+        return f"/album{i % self.categories}/image-{i}.jpg"
+
+    def track_name(self, i: int) -> str:
+        return f"track-{i}.mp3"
+
+    def blog_listing(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "path": self.post_path(i),
+                "cid": fake_cid("post", i, self.version),
+                "is_dir": False,
+                "object": {
+                    "created_at": leaky_date(START + STEP * i),
+                    "properties": {
+                        "title": f"Post number {i}",
+                        "description": f"What post {i} is about, in a sentence or so",
+                        "tags": [f"tag{i % 13}", f"tag{i % 7}"],
+                    },
+                },
+            }
+            for i in range(self.posts)
+        ]
+
+    def gallery_listing(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "path": self.image_path(i),
+                "cid": fake_cid("image", i, self.version),
+                "is_dir": False,
+                "object": {"created_at": leaky_date(START + STEP * i)},
+            }
+            for i in range(self.images)
+        ]
+
+    def music_listing(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "path": self.track_name(i),
+                "cid": fake_cid("track", i, self.version),
+                "is_dir": False,
+                "object": {"created_at": leaky_date(START + STEP * i)},
+            }
+            for i in range(self.tracks)
+        ]
+
+    def root_listing(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "path": f"/{name}",
+                "cid": fake_cid(name, 0, self.version),
+                "is_dir": True,
+                "object": None,
+            }
+            for name in ("blog", "gallery", "music")
+        ]
+
+    def post_html(self, name: str) -> str:
+        paragraph = (
+            f"<p>{name}: lorem ipsum dolor sit amet, consectetur adipiscing elit, "
+            "sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>\n"
+        )
+        return f"<h1>{name}</h1>\n" + paragraph * max(
+            1, self.body_size // len(paragraph)
+        )
+
+    @cached_property
+    def encoded(self) -> Dict[str, bytes]:
+        """Listings serialized once up front, so serving them costs nothing"""
+        return {
+            "/": json.dumps(self.root_listing()).encode(),
+            "blog": json.dumps(self.blog_listing()).encode(),
+            "gallery": json.dumps(self.gallery_listing()).encode(),
+            "music": json.dumps(self.music_listing()).encode(),
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "posts": self.posts,
+            "images": self.images,
+            "tracks": self.tracks,
+            "categories": self.categories,
+            "body_size": self.body_size,
+        }
@@ -0,0 +1,167 @@
+"""
+A stand-in for leaky serving a generated corpus, with injectable latency.
+
+    python -m bench.leaky [--port 9911] [--posts 10000] [--latency 0.02] ...
+
+Point ondo at it with `LEAKY_URL=http://localhost:9911`.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+from .corpus import Corpus
+
+# Small enough to read quickly, big enough to be a real looking image
+IMAGE = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 64
+TRACK = bytes(range(256)) * 4096
+
+
+def create_leaky(
+    corpus: Corpus, latency: float = 0.0, jitter: float = 0.0
+) -> Starlette:
+    """Build the stub app. Every response waits `latency` +/- `jitter` seconds"""
+    posts = {corpus.post_path(i).lstrip("/"): i for i in range(corpus.posts)}
+    hits = {"requests": 0}
+
+    async def delay():
+        hits["requests"] += 1
+        wait = latency + random.uniform(-jitter, jitter) if jitter else latency
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def listing(key: str) -> Response:
+        return Response(corpus.encoded[key], media_type="application/json")
+
+    async def root(request: Request):
+        await delay()
+        return listing("/")
+
+    async def blog(request: Request):
+        await delay()
+        return listing("blog")
+
+    async def blog_category(request: Request):
+        await delay()
+        category = request.path_params["category"]
+        return JSONResponse(
+            [
+                {**item, "path": item["path"].rsplit("/", 1)[1]}
+                for item in corpus.blog_listing()
+                if item["path"].split("/")[1] == category
+            ]
+        )
+
+    async def blog_post(request: Request):
+        await delay()
+        path = f"{request.path_params['category']}/{request.path_params['name']}"
+        if path not in posts:
+            return Response(status_code=404)
+        return HTMLResponse(corpus.post_html(path))
+
+    async def gallery(request: Request):
+        await delay()
+        return listing("gallery")
+
+    async def gallery_item(request: Request):
+        await delay()
+        return Response(IMAGE, media_type="image/jpeg")
+
+    async def music(request: Request):
+        await delay()
+        return listing("music")
+
+    async def track(request: Request):
+        await delay()
+        return Response(TRACK, media_type="audio/mpeg")
+
+    async def bump(request: Request):
+        # New content everywhere, as if something had been published
+        corpus.version += 1
+        corpus.__dict__.pop("encoded", None)
+        return JSONResponse({"version": corpus.version})
+
+    async def stats(request: Request):
+        return JSONResponse(hits)
+
+    return Starlette(
+        routes=[
+            Route("/", root),
+            Route("/_bump", bump, methods=["POST"]),
+            Route("/_stats", stats),
+            Route("/blog", blog),
+            Route("/blog/{category}", blog_category),
+            Route("/blog/{category}/{name}", blog_post),
+            Route("/gallery", gallery),
+            Route("/gallery/{category}/{name}", gallery_item),
+            Route("/music/me", music),
+            Route("/music/me/{name}", track),
+        ]
+    )
+
+
+class LeakyServer:
+    """Runs the stub on its own thread and event loop, off the one under test"""
+
+    def __init__(self, app: Starlette, host: str = "127.0.0.1", port: int = 0):
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.host = host
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        # With port 0 the OS picks one, read back what we got
+        sockets = self.server.servers[0].sockets
+        port = sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}"
+
+    def start(self, timeout: float = 10.0):
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("stub leaky failed to start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9911)
+    parser.add_argument("--posts", type=int, default=Corpus.posts)
+    parser.add_argument("--images", type=int, default=Corpus.images)
+    parser.add_argument("--tracks", type=int, default=Corpus.tracks)
+    parser.add_argument("--body-size", type=int, default=Corpus.body_size)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+
+    corpus = Corpus(
+        posts=args.posts,
+        images=args.images,
+        tracks=args.tracks,
+        body_size=args.body_size,
+    )
+    app = create_leaky(corpus, args.latency, args.jitter)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+In-process load driver: ondo served over an ASGI transport against a stub
+leaky, hitting every page route with a fixed number of concurrent clients.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .corpus import Corpus
+from .leaky import LeakyServer, create_leaky
+
+
+@dataclass
+class LoadOptions:
+    requests: int = 500
+    concurrency: int = 16
+    warmup: int = 20
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Only run endpoints containing one of these, all of them if empty
+    only: Optional[List[str]] = None
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], elapsed: float, statuses: Dict[int, int]):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+def endpoints(corpus: Corpus) -> List[str]:
+    """Every GET route in `src/server/pages`, with params filled from the corpus"""
+    from src.server.pages import router
+
+    # Something that exists for each collection, a little way down the list
+    post = corpus.post_path(min(5, corpus.posts - 1)).lstrip("/").split("/")
+    image = corpus.image_path(min(5, corpus.images - 1)).lstrip("/").split("/")
+    params = {
+        "blog": {"category": post[0], "name": post[1]},
+        "gallery": {"category": image[0], "name": image[1]},
+        "music": {"name": corpus.track_name(0)},
+    }
+
+    paths = []
+    for route in router.routes:
+        path = getattr(route, "path", None)
+        if path is None or "GET" not in getattr(route, "methods", ()):
+            continue
+        # Media is bytes off disk or leaky, not what we're measuring here
+        if "/media/" in path:
+            continue
+        collection = path.split("/")[1]
+        try:
+            paths.append(path.format_map(params.get(collection, {})))
+        except KeyError:
+            continue
+    return paths
+
+
+async def hammer(
+    client: httpx.AsyncClient, path: str, count: int, concurrency: int
+) -> Dict[str, Any]:
+    # htmx fragments are requested the way htmx would
+    headers = {"HX-Request": "true"} if "/api/" in path else {}
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = count
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, count))))
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+async def run_load(corpus: Corpus, options: LoadOptions) -> Dict[str, Any]:
+    leaky = LeakyServer(create_leaky(corpus, options.latency, options.jitter))
+    leaky.start()
+    scratch = tempfile.mkdtemp(prefix="ondo-bench-")
+    try:
+        # Config is read from the environment, so set it up before importing
+        os.environ.update(
+            {
+                "LEAKY_URL": leaky.url,
+                "DEBUG": "False",
+                "DEV_MODE": "False",
+                "LOG_PATH": os.path.join(scratch, "ondo.log"),
+                "TEMPLATE_CACHE_DIR": os.path.join(scratch, "templates"),
+                "MEDIA_CACHE_DIR": os.path.join(scratch, "media"),
+                # Never read or overwrite the real snapshot and shared cache
+                "SNAPSHOT_DIR": os.path.join(scratch, "snapshot"),
+                "SHARED_CACHE_PATH": os.path.join(scratch, "shared.db"),
+            }
+        )
+        from src.config import Config
+        from src.server import create_app
+        from src.state import AppState
+
+        state = AppState.from_config(Config())
+        app = create_app(state)
+        results: Dict[str, Any] = {}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", timeout=60
+            ) as client:
+                for path in endpoints(corpus):
+                    if options.only and not any(o in path for o in options.only):
+                        continue
+                    if options.warmup:
+                        await hammer(client, path, options.warmup, options.concurrency)
+                    results[path] = await hammer(
+                        client, path, options.requests, options.concurrency
+                    )
+                    print(
+                        f"{path}: p50 {results[path]['p50_ms']}ms"
+                        f" p99 {results[path]['p99_ms']}ms"
+                        f" {results[path]['throughput_rps']} req/s"
+                    )
+        state.logger.stop()
+        return results
+    finally:
+        leaky.stop()
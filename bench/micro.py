@@ -0,0 +1,78 @@
+"""Micro-benchmarks for the hot CPU paths: listing parsers, `parse_date` and search"""
+
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from .corpus import Corpus
+
+BASE_URL = "http://leaky"
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Run `fn` `repeat` times, reporting the best and median in milliseconds"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "best_ms": round(min(timings) * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+    }
+
+
+def per_item(result: Dict[str, float], items: int) -> Dict[str, float]:
+    result["per_item_us"] = round(result["best_ms"] * 1000 / max(items, 1), 3)
+    return result
+
+
+def run_micro(corpus: Corpus, repeat: int = 5) -> Dict[str, Any]:
+    from src.leaky import AudioTrack, BlogPost, GalleryImage, SearchIndex, parse_date
+    from src.leaky.utils import decode_json
+
+    raw = corpus.encoded
+    blog = json.loads(raw["blog"])
+    gallery = json.loads(raw["gallery"])
+    music = json.loads(raw["music"])
+    dates = [item["object"]["created_at"] for item in gallery]
+    posts = BlogPost.from_listing(blog)
+
+    def build_search() -> SearchIndex:
+        index = SearchIndex()
+        for post in posts:
+            index.add(post)
+        return index
+
+    search = build_search()
+
+    cases: Dict[str, Any] = {
+        # What every listing pays before parsing even starts
+        "json_decode_gallery": per_item(
+            measure(lambda: decode_json(raw["gallery"]), repeat), len(gallery)
+        ),
+        "blog_from_listing": per_item(
+            measure(lambda: BlogPost.from_listing(blog), repeat), len(blog)
+        ),
+        "gallery_from_listing": per_item(
+            measure(lambda: GalleryImage.from_listing(gallery, BASE_URL), repeat),
+            len(gallery),
+        ),
+        "music_from_listing": per_item(
+            measure(lambda: AudioTrack.from_listing(music, BASE_URL), repeat),
+            len(music),
+        ),
+        "parse_date": per_item(
+            measure(lambda: [parse_date(date) for date in dates], repeat),
+            len(dates),
+        ),
+        "search_index": per_item(measure(build_search, repeat), len(posts)),
+        # Repeated queries are served from cached term scores
+        "search_query": per_item(
+            measure(lambda: search.search("tag3 abo"), repeat), len(posts)
+        ),
+    }
+    for name, result in cases.items():
+        print(f"{name}: {result['best_ms']}ms ({result['per_item_us']}us per item)")
+    return cases
@@ -0,0 +1,14 @@
+#!/bin/bash
+
+# Run the benchmarks, e.g. `./bin/bench.sh load --posts 10000 --images 50000`
+# Compare two runs with `./bin/bench.sh compare before.json after.json`
+
+# Source utilities
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+source "$SCRIPT_DIR/utils.sh"
+
+# Ensure we're in the project root
+cd "$PROJECT_ROOT" || exit 1
+
+print_header "Running Benchmarks"
+uv run python -m bench "$@"
@@ -28,5 +28,10 @@ print_header "Running MyPy Type Checker"
 uvx mypy src
 check_result "MyPy"
 
+# Run the tests
+print_header "Running Tests"
+uv run pytest -q
+check_result "Tests"
+
 # Final summary
 print_summary "All checks passed successfully!"
\ No newline at end of file
@@ -0,0 +1,13 @@
+#!/bin/bash
+
+# Run the tests, e.g. `./bin/test.sh -k search`
+
+# Source utilities
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+source "$SCRIPT_DIR/utils.sh"
+
+# Ensure we're in the project root
+cd "$PROJECT_ROOT" || exit 1
+
+print_header "Running Tests"
+uv run pytest "$@"
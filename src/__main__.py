@@ -20,6 +20,13 @@ def init_state(config: Config) -> Optional[AppState]:
 
 # Initialize at module level
 config = Config()
+
+# `python -m src <command> ...` runs a command instead of the server
+if __name__ == "__main__" and len(sys.argv) > 1:
+    from src.cli import run
+
+    sys.exit(run(config, sys.argv[1:]))
+
 config.show()
 state = init_state(config)
 app = create_app(state) if state else None
@@ -36,8 +43,12 @@ def main() -> int:
 
         print("✓ FastAPI application created")
 
-        # Start server
-        print(f"Starting server on {config.listen_address}:{config.listen_port}")
+        # Start server, each worker imports this module and builds its own app
+        workers = 1 if config.dev_mode else max(config.workers, 1)
+        print(
+            f"Starting server on {config.listen_address}:{config.listen_port}"
+            f" with {workers} worker{'s' if workers > 1 else ''}"
+        )
         uvicorn.run(
             "src.__main__:app",
             host=config.listen_address,
@@ -45,6 +56,7 @@ def main() -> int:
             proxy_headers=True,
             reload=config.dev_mode,
             reload_dirs=["src"],
+            workers=workers,
         )
         return 0
 
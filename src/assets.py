@@ -0,0 +1,114 @@
+"""
+Build fingerprinted, precompressed copies of `static/` for production.
+
+    python -m src.assets [source] [out]
+
+Every file is copied to a content hashed name (`css/main.css` ->
+`css/main.3f2a1b9c0d4e.css`) alongside `.gz` and `.br` siblings for text
+assets, and `manifest.json` maps the original paths to what was built.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import brotli
+
+MANIFEST_NAME = "manifest.json"
+
+# Worth compressing -- images and fonts already are
+COMPRESSIBLE = {
+    ".css",
+    ".js",
+    ".map",
+    ".json",
+    ".svg",
+    ".ico",
+    ".txt",
+    ".xml",
+    ".html",
+    ".webmanifest",
+}
+
+# Below this compression saves less than the headers cost
+MIN_COMPRESS_SIZE = 256
+
+
+def fingerprint(path: str, data: bytes) -> str:
+    root, ext = os.path.splitext(path)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f"{root}.{digest}{ext}"
+
+
+def build(source: str = "static", out: str = "build/static") -> Dict[str, Any]:
+    """Build every file under `source` into `out`, returning the manifest"""
+    files: Dict[str, Dict[str, Any]] = {}
+
+    for root, _, names in os.walk(source):
+        for name in sorted(names):
+            source_path = os.path.join(root, name)
+            path = os.path.relpath(source_path, source).replace(os.sep, "/")
+            with open(source_path, "rb") as f:
+                data = f.read()
+
+            hashed = fingerprint(path, data)
+            _write(os.path.join(out, hashed), data)
+
+            encodings: List[str] = []
+            if (
+                os.path.splitext(path)[1] in COMPRESSIBLE
+                and len(data) >= MIN_COMPRESS_SIZE
+            ):
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    _write(os.path.join(out, f"{hashed}.br"), compressed)
+                    encodings.append("br")
+                # mtime=0 so rebuilding the same file gives the same bytes
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    _write(os.path.join(out, f"{hashed}.gz"), compressed)
+                    encodings.append("gzip")
+
+            files[path] = {"path": hashed, "encodings": encodings}
+
+    manifest = {"files": files}
+    _write(
+        os.path.join(out, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode(),
+    )
+    return manifest
+
+
+def load_manifest(out: str) -> Optional[Dict[str, Any]]:
+    """The manifest from a previous build, if there is one"""
+    try:
+        with open(os.path.join(out, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write(path: str, data: bytes):
+    # Write then rename so a running server never sees half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def main(argv: List[str]) -> int:
+    source = argv[0] if len(argv) > 0 else "static"
+    out = argv[1] if len(argv) > 1 else "build/static"
+    manifest = build(source, out)
+    for path, entry in sorted(manifest["files"].items()):
+        encodings = ", ".join(entry["encodings"]) or "none"
+        print(f"{path} -> {entry['path']} ({encodings})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
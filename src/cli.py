@@ -0,0 +1,130 @@
+"""
+Commands run with `python -m src <command>` instead of starting the server.
+
+    python -m src snapshot export [dir]   write a snapshot of leaky
+    python -m src snapshot verify [dir]   check a snapshot is intact
+    python -m src export <dir>            render the site to static files
+
+`dir` defaults to SNAPSHOT_DIR.
+"""
+
+import asyncio
+import sys
+from typing import List
+
+from src.config import Config
+from src.export import export
+from src.leaky import ContentCache, LeakyStore, Snapshot, create_client
+from src.leaky.refresher import COLLECTION_DIRS
+from src.leaky.store import COLLECTIONS
+
+# Posts read from leaky at once while exporting
+EXPORT_CONCURRENCY = 8
+
+
+async def export_snapshot(config: Config, directory: str) -> int:
+    if config.leaky_url is None:
+        print("LEAKY_URL is not set")
+        return 1
+
+    async with create_client(timeout=config.leaky_timeout) as client:
+        # Everything we read has to fit, so the content cache is unbounded
+        store = LeakyStore(
+            config.leaky_url, client, content=ContentCache(max_bytes=sys.maxsize)
+        )
+        versions = await store.root_versions()
+        for collection in COLLECTIONS:
+            version = versions.get(COLLECTION_DIRS[collection])
+            if version is not None:
+                index = await store.refresh(collection, version)
+            else:
+                index = await store.index(collection)
+            print(f"{collection}: {len(index.entries)} entries ({index.version})")
+
+        posts = await store.posts()
+        semaphore = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+        async def read(category: str, name: str) -> bool:
+            async with semaphore:
+                return await store.post(category, name) is not None
+
+        read_posts = await asyncio.gather(
+            *(read(post.category, post.name) for post in posts)
+        )
+        print(f"blog content: {sum(read_posts)} of {len(posts)} posts")
+
+        await store.save_snapshot(directory)
+        await store.close()
+
+    failed = len(posts) - sum(read_posts)
+    if failed:
+        print(f"{failed} posts couldn't be read, the snapshot is missing them")
+    print(f"wrote snapshot to {directory}")
+    return 0
+
+
+async def verify_snapshot(config: Config, directory: str) -> int:
+    snapshot = Snapshot.open(directory)
+    if snapshot is None:
+        print(f"no snapshot in {directory}")
+        return 1
+
+    problems = snapshot.verify()
+    async with create_client() as client:
+        store = LeakyStore(config.leaky_url or "", client)
+        for collection in COLLECTIONS:
+            saved = snapshot.listing(collection)
+            if saved is None:
+                problems.append(f"{collection} listing is missing")
+                continue
+            try:
+                index = await store.load_index(collection, saved[1], saved[0])
+            except ValueError as e:
+                problems.append(f"{collection} listing doesn't parse: {e}")
+                continue
+            print(f"{collection}: {len(index.entries)} entries ({saved[0]})")
+            if collection == "blog":
+                missing = [
+                    post.path
+                    for post in index.entries
+                    if post.cid and snapshot.content(post.cid) is None
+                ]
+                print(f"blog content: {len(index.entries) - len(missing)} posts")
+                if missing:
+                    # Not fatal, they're read from leaky when asked for
+                    print(f"no content for {len(missing)} posts")
+    snapshot.close()
+
+    for problem in problems:
+        print(f"✗ {problem}")
+    if problems:
+        return 1
+    print(f"✓ snapshot in {directory} is intact")
+    return 0
+
+
+def snapshot(config: Config, argv: List[str]) -> int:
+    if not argv or argv[0] not in ("export", "verify"):
+        print("usage: python -m src snapshot export|verify [dir]")
+        return 1
+    directory = argv[1] if len(argv) > 1 else config.snapshot_dir
+    if directory is None:
+        print("no snapshot directory, pass one or set SNAPSHOT_DIR")
+        return 1
+    if argv[0] == "export":
+        return asyncio.run(export_snapshot(config, directory))
+    return asyncio.run(verify_snapshot(config, directory))
+
+
+COMMANDS = {
+    "snapshot": snapshot,
+    "export": export,
+}
+
+
+def run(config: Config, argv: List[str]) -> int:
+    command = COMMANDS.get(argv[0]) if argv else None
+    if command is None:
+        print(__doc__)
+        return 1
+    return command(config, argv[1:])
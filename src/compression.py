@@ -0,0 +1,219 @@
+import gzip
+import zlib
+from typing import Any, Optional, Set
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Smaller than this isn't worth the cpu or the headers
+MINIMUM_SIZE = 500
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# Per request compression needs to be quick, cached bodies are compressed once
+#  so they can afford to try harder
+GZIP_LEVEL = 6
+GZIP_CACHED_LEVEL = 9
+BROTLI_QUALITY = 4
+BROTLI_CACHED_QUALITY = 9
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Content codings an Accept-Encoding header allows (q > 0)"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The best encoding we can produce that the client accepts"""
+    accepted = accepted_encodings(accept_encoding)
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        quality = BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY
+        return brotli.compress(data, quality=quality)
+    if encoding == "gzip":
+        level = GZIP_CACHED_LEVEL if cached else GZIP_LEVEL
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    raise ValueError(f"can't compress with {encoding}")
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def encoded_headers(headers: MutableHeaders, encoding: str):
+    """Mark `headers` as describing a body compressed with `encoding`"""
+    headers["Content-Encoding"] = encoding
+    add_vary(headers)
+    # The compressed bytes differ, so the etag can't stay strong
+    etag = headers.get("etag")
+    if etag is not None and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+def add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if vary is None:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes each chunk, for streamed responses"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._compressor: Any
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits 31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, whichever the client prefers that
+    we have. Responses that are already encoded (precompressed static files,
+    cached compressed fragments), too small, or not text are left alone.
+    Streamed responses are flushed chunk by chunk so streaming still streams.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _Responder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+
+        self.start: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            if self._should_compress(message):
+                # Hold on to the start until we know how big the body is
+                self.start = message
+            else:
+                self.passthrough = True
+                await self._send(message)
+            return
+
+        if self.passthrough or self.start is None:
+            await self._send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            # e.g. pathsend -- nothing for us to compress
+            await self._send(self.start)
+            self.start = None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+
+        if self.compressor is None and not more_body:
+            # Whole body in one go
+            if len(body) < self.minimum_size:
+                add_vary(headers)
+                await self._send(self.start)
+                self.passthrough = True
+                await self._send(message)
+                return
+
+            body = compress(body, self.encoding)
+            encoded_headers(headers, self.encoding)
+            headers["Content-Length"] = str(len(body))
+            await self._send(self.start)
+            self.passthrough = True
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        if self.compressor is None:
+            # Streaming, we can't know the length up front
+            self.compressor = StreamCompressor(self.encoding)
+            encoded_headers(headers, self.encoding)
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self._send(self.start)
+
+        data = self.compressor.compress(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    def _should_compress(self, message: Message) -> bool:
+        if message["status"] != 200:
+            return False
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        if not is_compressible(headers.get("content-type", "")):
+            return False
+        length = headers.get("content-length")
+        if length is not None and int(length) < self.minimum_size:
+            return False
+        return True
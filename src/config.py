@@ -1,6 +1,8 @@
 from dotenv import load_dotenv
 import os
 
+from src.leaky.store import PARSE_IN_THREAD_BYTES
+
 
 def empty_to_none(field):
     value = os.getenv(field)
@@ -23,9 +25,34 @@ class Config:
     host_name: str
     listen_address: str
     listen_port: int
+    workers: int
     debug: bool
     log_path: str | None
+    log_json: bool
     leaky_url: str
+    leaky_max_connections: int
+    leaky_max_keepalive_connections: int
+    leaky_keepalive_expiry: float
+    leaky_timeout: float
+    leaky_cache_ttl_blog: float
+    leaky_cache_ttl_gallery: float
+    leaky_cache_ttl_music: float
+    leaky_cache_max_entries: int
+    leaky_content_cache_max_bytes: int
+    leaky_refresh_interval: float
+    leaky_parse_in_thread_bytes: int
+    fragment_cache_max_bytes: int
+    prefetch_count: int
+    shared_cache_path: str
+    shared_cache_max_bytes: int
+    snapshot_dir: str | None
+    template_cache_dir: str
+    static_build_dir: str
+    page_size: int
+    gallery_proxy: bool
+    music_proxy: bool
+    media_cache_dir: str
+    media_cache_max_bytes: int
 
     secrets: Secrets
 
@@ -41,11 +68,87 @@ class Config:
 
         self.listen_port = int(os.getenv("LISTEN_PORT", 8000))
 
+        # Server processes to run. With more than one they share caches
+        #  through `shared_cache_path` and only one of them polls leaky.
+        #  Ignored in dev mode, which reloads a single process
+        self.workers = int(os.getenv("WORKERS", "1"))
+
         # Set the log path
         self.log_path = empty_to_none("LOG_PATH")
 
+        # Write logs as JSON lines instead of text
+        self.log_json = os.getenv("LOG_JSON", "False") == "True"
+
         self.leaky_url = empty_to_none("LEAKY_URL")
 
+        # Connection pool settings for the shared leaky client
+        self.leaky_max_connections = int(os.getenv("LEAKY_MAX_CONNECTIONS", "100"))
+        self.leaky_max_keepalive_connections = int(
+            os.getenv("LEAKY_MAX_KEEPALIVE_CONNECTIONS", "20")
+        )
+        self.leaky_keepalive_expiry = float(os.getenv("LEAKY_KEEPALIVE_EXPIRY", "30"))
+        self.leaky_timeout = float(os.getenv("LEAKY_TIMEOUT", "10"))
+
+        # Listing cache -- how long (seconds) each collection is fresh for
+        self.leaky_cache_ttl_blog = float(os.getenv("LEAKY_CACHE_TTL_BLOG", "60"))
+        self.leaky_cache_ttl_gallery = float(
+            os.getenv("LEAKY_CACHE_TTL_GALLERY", "300")
+        )
+        self.leaky_cache_ttl_music = float(os.getenv("LEAKY_CACHE_TTL_MUSIC", "300"))
+        self.leaky_cache_max_entries = int(os.getenv("LEAKY_CACHE_MAX_ENTRIES", "64"))
+
+        # Content cache -- immutable post bodies keyed by CID, bounded in bytes
+        self.leaky_content_cache_max_bytes = int(
+            os.getenv("LEAKY_CONTENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+        )
+
+        # How often (seconds) to poll leaky for changed collections, 0 disables
+        #  polling and falls back to the listing cache ttls above
+        self.leaky_refresh_interval = float(os.getenv("LEAKY_REFRESH_INTERVAL", "30"))
+
+        # Listings bigger than this (bytes) are parsed off the event loop
+        self.leaky_parse_in_thread_bytes = int(
+            os.getenv("LEAKY_PARSE_IN_THREAD_BYTES", str(PARSE_IN_THREAD_BYTES))
+        )
+
+        # Where a snapshot of leaky is kept, so a restart can serve straight away
+        #  and an outage doesn't empty the site. Empty disables snapshots
+        self.snapshot_dir = os.getenv("SNAPSHOT_DIR", "data/snapshot") or None
+
+        # Rendered html fragment cache, bounded in bytes
+        self.fragment_cache_max_bytes = int(
+            os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+        )
+
+        # How many entries at the top of a rendered list to warm up ahead of
+        #  a click, 0 to turn prefetching off
+        self.prefetch_count = int(os.getenv("PREFETCH_COUNT", "4"))
+
+        # SQLite file (WAL mode) workers share listings, post bodies and
+        #  rendered fragments through, when there's more than one
+        self.shared_cache_path = os.getenv("SHARED_CACHE_PATH", "data/shared.db")
+        self.shared_cache_max_bytes = int(
+            os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+        )
+
+        # Where compiled template bytecode is kept between processes
+        self.template_cache_dir = os.getenv("TEMPLATE_CACHE_DIR", "data/templates")
+
+        # Output of `python -m src.assets`, served in place of `static/` when present
+        self.static_build_dir = os.getenv("STATIC_BUILD_DIR", "build/static")
+
+        # How many items list endpoints return per page, 0 for everything
+        self.page_size = int(os.getenv("PAGE_SIZE", "24"))
+
+        # Serve gallery media and music through ondo from an on-disk cache
+        #  instead of pointing browsers at leaky
+        self.gallery_proxy = os.getenv("GALLERY_PROXY", "False") == "True"
+        self.music_proxy = os.getenv("MUSIC_PROXY", "False") == "True"
+        self.media_cache_dir = os.getenv("MEDIA_CACHE_DIR", "data/media")
+        self.media_cache_max_bytes = int(
+            os.getenv("MEDIA_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))
+        )
+
         # Determine if the DEBUG mode is set
         debug = os.getenv("DEBUG", "True")
         self.debug = debug == "True"
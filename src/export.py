@@ -0,0 +1,297 @@
+"""
+Render the whole site to static files.
+
+    python -m src export <dir>
+
+Every page, every htmx fragment, and every post and gallery item is rendered
+through the app and written to `<dir>/<url>/index.html`, with static assets
+built into `<dir>/static`. The result can be served by any static host.
+
+A manifest in `<dir>` records what each file was rendered from (the CIDs of
+the content behind it, plus the templates and assets), so exporting again
+only re-renders what changed and removes what's gone.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import quote, unquote
+
+import httpx
+
+from src.assets import build
+from src.config import Config
+from src.leaky import BlogIndex
+
+MANIFEST_NAME = ".export.json"
+
+# Renders in flight at once
+EXPORT_CONCURRENCY = 8
+
+
+@dataclass
+class Output:
+    url: str
+    # What the output was rendered from, it's re-rendered when this changes
+    source: str
+    # Fragments are requested the way htmx requests them
+    htmx: bool = False
+
+    @property
+    def file(self) -> str:
+        # Static hosts decode the request path before looking for a file, but
+        #  a name with a slash in it stays quoted so it can't add directories
+        path = "/".join(
+            segment if "/" in unquote(segment) else unquote(segment)
+            for segment in self.url.strip("/").split("/")
+        )
+        return f"{path}/index.html" if path else "index.html"
+
+
+def url(*segments: str) -> Optional[str]:
+    """
+    A url from path segments, each quoted whole so names from leaky (tags,
+    categories, post names) can't add or climb directories.
+    None for segments no url can hold, i.e. "." and "..".
+    """
+    if any(segment in ("", ".", "..") for segment in segments):
+        return None
+    return "/" + "/".join(quote(segment, safe="") for segment in segments)
+
+
+def output_path(directory: str, output: Output) -> Optional[str]:
+    """Where `output` is written in `directory`, or None if it'd land outside it"""
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, output.file))
+    return path if os.path.commonpath([root, path]) == root else None
+
+
+def plan(versions: Dict[str, str], blog: BlogIndex, images: List) -> List[Output]:
+    """Everything to export. Page shells only depend on templates and assets"""
+
+    def add(source: str, *segments: str, htmx: bool = False):
+        output_url = url(*segments)
+        if output_url is not None:
+            outputs.append(Output(output_url, source, htmx=htmx))
+
+    outputs = [
+        Output("/", ""),
+        Output("/about", ""),
+        Output("/blog", ""),
+        Output("/gallery", ""),
+        Output("/music", ""),
+        Output("/blog/api/posts", versions["blog"], htmx=True),
+        Output("/gallery/api/items", versions["gallery"], htmx=True),
+        Output("/music/api/content", versions["music"], htmx=True),
+        Output("/blog/api/tags", versions["blog"], htmx=True),
+    ]
+    # Filtered lists only change with the posts in them
+    for category, posts in blog.by_category.items():
+        add(posts.version, "blog", "api", "categories", category, htmx=True)
+    for tag, posts in blog.by_tag.items():
+        add(posts.version, "blog", "api", "tags", tag, htmx=True)
+    for post in blog.entries:
+        segments = post.path.split("/")
+        add("", "blog", *segments)
+        add(post.cid or "", "blog", "api", "posts", *segments, htmx=True)
+    for image in images:
+        segments = image.path.split("/")
+        add("", "gallery", *segments)
+        add(image.cid, "gallery", "api", "items", *segments, htmx=True)
+    return outputs
+
+
+# Routes in src/server/pages that `plan` covers, anything else gets a warning
+EXPORTED_ROUTES = {
+    "/",
+    "/about",
+    "/blog",
+    "/blog/api/posts",
+    "/blog/{category}/{name}",
+    "/blog/api/posts/{category}/{name}",
+    "/blog/api/categories/{category}",
+    "/blog/api/tags",
+    "/blog/api/tags/{tag}",
+    "/gallery",
+    "/gallery/api/items",
+    "/gallery/{category}/{name}",
+    "/gallery/api/items/{category}/{name}",
+    "/music",
+    "/music/api/content",
+}
+
+# Media is linked straight from leaky in an export, and search needs a server
+SKIPPED_ROUTES = {
+    "/gallery/media/{category}/{name}",
+    "/music/media/{name:path}",
+    "/blog/api/search",
+}
+
+
+def unexported_routes() -> List[str]:
+    from fastapi.routing import APIRoute
+
+    from src.server.pages import router
+
+    return [
+        route.path
+        for route in router.routes
+        if isinstance(route, APIRoute)
+        and "GET" in route.methods
+        and route.path not in EXPORTED_ROUTES | SKIPPED_ROUTES
+    ]
+
+
+def load_manifest(directory: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"site": None, "outputs": {}}
+
+
+def write_file(path: str, data: bytes):
+    # Write then rename so a host serving the directory never sees half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def remove_file(directory: str, file: str):
+    path = os.path.join(directory, file)
+    if os.path.exists(path):
+        os.remove(path)
+    # Tidy up directories that only held this
+    parent = os.path.dirname(path)
+    while parent != directory and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+
+async def export_site(config: Config, directory: str) -> int:
+    if config.leaky_url is None:
+        print("LEAKY_URL is not set")
+        return 1
+
+    # Static hosts can't follow cursors or proxy media, and we want what
+    #  leaky has right now rather than a snapshot
+    config.page_size = 0
+    config.gallery_proxy = False
+    config.music_proxy = False
+    config.leaky_refresh_interval = 0
+    config.snapshot_dir = None
+    config.dev_mode = False
+
+    from src.server import create_app
+    from src.server.handlers.caching import templates_version
+    from src.server.handlers.static import assets
+    from src.server.handlers.templates import templates
+    from src.state import AppState
+
+    for route in unexported_routes():
+        print(f"warning: {route} isn't exported")
+
+    directory = os.path.abspath(directory)
+    static_dir = os.path.join(directory, "static")
+
+    state = AppState.from_config(config)
+    app = create_app(state)
+    async with app.router.lifespan_context(app):
+        # Pages link to the hashed assets in the export
+        build("static", static_dir)
+        assets.load(static_dir)
+        templates.env.globals["static_site"] = True
+        site = hashlib.sha1(
+            f"{templates_version()}:{assets.version}".encode()
+        ).hexdigest()
+
+        store = state.leaky
+        assert store is not None
+        versions = {
+            collection: await store.version(collection)
+            for collection in ("blog", "gallery", "music")
+        }
+        outputs = plan(versions, await store.blog(), await store.images())
+
+        previous = load_manifest(directory)
+        rendered: Dict[str, Dict[str, str]] = {}
+        stale = [
+            output
+            for output in outputs
+            if previous["site"] != site
+            or previous["outputs"].get(output.url, {}).get("source") != output.source
+            or not os.path.exists(os.path.join(directory, output.file))
+        ]
+        failed: Set[str] = set()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://export", timeout=60
+        ) as client:
+            semaphore = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+            async def render(output: Output):
+                headers = {"Accept-Encoding": "identity"}
+                if output.htmx:
+                    headers["HX-Request"] = "true"
+                async with semaphore:
+                    response = await client.get(output.url, headers=headers)
+                if response.status_code != 200:
+                    print(f"✗ {output.url} returned {response.status_code}")
+                    failed.add(output.url)
+                    return
+                path = output_path(directory, output)
+                if path is None:
+                    print(f"✗ {output.url} would be written outside {directory}")
+                    failed.add(output.url)
+                    return
+                write_file(path, response.content)
+
+            await asyncio.gather(*(render(output) for output in stale))
+
+            # Whatever a static host shows for a missing file
+            not_found = await client.get(
+                "/404", headers={"Accept-Encoding": "identity"}
+            )
+            write_file(os.path.join(directory, "404.html"), not_found.content)
+
+    for output in outputs:
+        entry: Optional[Dict[str, str]] = previous["outputs"].get(output.url)
+        if output.url in failed:
+            # Keep what we had, if anything, and try again next time
+            if entry is not None:
+                rendered[output.url] = {**entry, "source": ""}
+            continue
+        rendered[output.url] = {"file": output.file, "source": output.source}
+
+    removed = [
+        entry["file"]
+        for url, entry in previous["outputs"].items()
+        if url not in rendered
+    ]
+    for file in removed:
+        remove_file(directory, file)
+
+    manifest = {"site": site, "outputs": rendered}
+    write_file(
+        os.path.join(directory, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode(),
+    )
+
+    print(
+        f"exported {len(outputs)} urls to {directory}: "
+        f"{len(stale) - len(failed)} rendered, {len(outputs) - len(stale)} unchanged, "
+        f"{len(removed)} removed, {len(failed)} failed"
+    )
+    return 1 if failed else 0
+
+
+def export(config: Config, argv: List[str]) -> int:
+    if len(argv) != 1:
+        print("usage: python -m src export <dir>")
+        return 1
+    return asyncio.run(export_site(config, argv[0]))
@@ -0,0 +1,108 @@
+from typing import Dict, Optional, Tuple, cast
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+from src.compression import (
+    MINIMUM_SIZE,
+    add_vary,
+    choose_encoding,
+    compress,
+    encoded_headers,
+)
+from src.leaky import ContentCache, SharedCache
+
+# (template path, content version, request variant)
+FragmentKey = Tuple[str, str, str]
+
+
+class FragmentCache(ContentCache):
+    """
+    Rendered html fragments, keyed by template, the version of the content
+    they were rendered from, and the request variant (e.g. query params).
+    Compressed copies are kept next to them so each is compressed only once.
+    Bounded in bytes like the content cache. With a `shared` cache, components
+    rendered by other workers are picked up from it rather than re-rendered
+    (`load_fragment`/`share_fragment`). Pages are cheap to render and only
+    kept per process.
+    """
+
+    def __init__(
+        self, max_bytes: int = 32 * 1024 * 1024, shared: Optional[SharedCache] = None
+    ):
+        super().__init__(max_bytes=max_bytes)
+        self.shared = shared
+        # Set to the templates version, so workers running other templates
+        #  (e.g. mid deploy) never see each other's fragments
+        self.namespace = ""
+
+    def get_fragment(self, key: FragmentKey) -> Optional[bytes]:
+        return self.get(key)
+
+    def put_fragment(self, key: FragmentKey, body: bytes):
+        self.put(key, body, len(body))
+
+    async def load_fragment(self, key: FragmentKey) -> Optional[bytes]:
+        """A fragment from this process, or failing that from another worker"""
+        body = self.get(key)
+        if body is None and self.shared is not None:
+            body = await self.shared.get(self._shared_key(key))
+            if body is not None:
+                self.put(key, body, len(body))
+        return body
+
+    def share_fragment(self, key: FragmentKey, body: bytes):
+        """Cache a fragment here and for every other worker"""
+        self.put(key, body, len(body))
+        if self.shared is not None:
+            self.shared.put(self._shared_key(key), body)
+
+    def _shared_key(self, key: FragmentKey) -> str:
+        return "fragment:" + "\x1f".join((self.namespace, *key))
+
+    def get_encoded(self, key: FragmentKey, encoding: str) -> Optional[bytes]:
+        """A fragment compressed with `encoding`, compressing it the first time"""
+        encoded_key = (*key, encoding)
+        body = self.get(encoded_key)
+        if body is None:
+            identity = self.get(key)
+            if identity is None:
+                return None
+            body = compress(identity, encoding, cached=True)
+            self.put(encoded_key, body, len(body))
+        return body
+
+    def respond(
+        self,
+        request: Request,
+        key: FragmentKey,
+        body: bytes,
+        headers: Dict[str, str],
+    ) -> Response:
+        """Serve a cached fragment, compressed if the client takes it"""
+        if len(body) < MINIMUM_SIZE:
+            return HTMLResponse(content=body, headers=headers)
+
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        encoded = self.get_encoded(key, encoding) if encoding else None
+        response = HTMLResponse(content=encoded or body, headers=headers)
+        if encoding is not None and encoded is not None:
+            encoded_headers(response.headers, encoding)
+        else:
+            add_vary(response.headers)
+        return response
+
+    def invalidate(self, template: Optional[str] = None, version: Optional[str] = None):
+        """Drop fragments for a template and/or content version, or everything"""
+        if template is None and version is None:
+            self.clear()
+            return
+
+        for key in self.keys():
+            # Compressed copies have the encoding tacked on the end
+            key_template, key_version = cast(FragmentKey, key)[:2]
+            if template is not None and key_template != template:
+                continue
+            if version is not None and key_version != version:
+                continue
+            self.discard(key)
@@ -1,4 +1,17 @@
 from .models import BlogPost, BlogPostMetadata, GalleryImage, AudioTrack, FileObject
+from .cache import ContentCache, ListingCache
+from .client import create_client, use_client
+from .disk import DiskCache
+from .download import Download
+from .flight import SingleFlight
+from .index import BlogIndex, PathIndex
+from .pagination import InvalidCursor, Page, paginate
+from .prefetch import Prefetcher
+from .refresher import Refresher
+from .search import PostSearch, SearchIndex
+from .shared import LeaderLock, SharedCache
+from .snapshot import Snapshot, write_snapshot
+from .store import LeakyError, LeakyStore
 from .utils import parse_date
 
 __all__ = [
@@ -8,4 +21,26 @@ __all__ = [
     "AudioTrack",
     "FileObject",
     "parse_date",
+    "create_client",
+    "use_client",
+    "ContentCache",
+    "DiskCache",
+    "Download",
+    "ListingCache",
+    "BlogIndex",
+    "PathIndex",
+    "InvalidCursor",
+    "Page",
+    "paginate",
+    "Prefetcher",
+    "SingleFlight",
+    "LeakyError",
+    "LeakyStore",
+    "Refresher",
+    "PostSearch",
+    "SearchIndex",
+    "LeaderLock",
+    "SharedCache",
+    "Snapshot",
+    "write_snapshot",
 ]
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+
+
+class ListingCache:
+    """
+    Bounded in-process cache for leaky listings.
+    Expired entries are served stale while a single background task refreshes them.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    async def get(
+        self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value for `key`, fetching it on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            value = await fetch()
+            self.set(key, value, ttl)
+            return value
+
+        self._entries.move_to_end(key)
+        if entry.expires_at > time.monotonic():
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            self._refresh(key, ttl, fetch)
+        return entry.value
+
+    def peek(self, key: str) -> Any:
+        """Return the cached value for `key` without counting or refreshing"""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._entries[key] = CacheEntry(value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refresh_errors": self.refresh_errors,
+        }
+
+    async def close(self):
+        """Cancel any in-flight background refreshes"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _refresh(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]):
+        # Only ever run one refresh per key
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                self.set(key, await fetch(), ttl)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the stale value and retry after another ttl
+                self.refresh_errors += 1
+                logger.warning(f"failed to refresh cached listing {key}: {e}")
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.expires_at = time.monotonic() + ttl
+            finally:
+                self._refreshing.pop(key, None)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class ContentCache:
+    """
+    Process-lifetime cache for immutable content keyed by CID.
+    Bounded by total size in bytes, evicting the least recently used entries.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the cached value for `key` without counting or touching it"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any, size: int):
+        # Never let a single oversized entry flush everything else
+        if size > self.max_bytes:
+            return
+
+        self.discard(key)
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key: Hashable):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+
+    def keys(self) -> List[Hashable]:
+        return list(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,61 @@
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+
+# Called with (request, status or None if it failed, seconds until headers)
+ResponseObserver = Callable[[httpx.Request, Optional[int], float], None]
+
+
+class ObservedTransport(httpx.AsyncBaseTransport):
+    """Times every request to leaky and reports it to an observer"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, observer: ResponseObserver):
+        self.transport = transport
+        self.observer = observer
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            self.observer(request, None, time.perf_counter() - started)
+            raise
+        self.observer(request, response.status_code, time.perf_counter() - started)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def create_client(
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    timeout: float = 10.0,
+    observer: Optional[ResponseObserver] = None,
+) -> httpx.AsyncClient:
+    """Create a long-lived client with a keep-alive connection pool to leaky"""
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(limits=limits)
+    if observer is not None:
+        transport = ObservedTransport(transport, observer)
+    return httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(timeout))
+
+
+@asynccontextmanager
+async def use_client(
+    client: Optional[httpx.AsyncClient] = None,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the given client, or a throwaway one if none was provided"""
+    if client is not None:
+        yield client
+        return
+
+    async with httpx.AsyncClient() as temp_client:
+        yield temp_client
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+SAFE_KEY = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+class DiskCache:
+    """
+    Content addressed files on local disk, keyed by CID.
+    Bounded by total size in bytes, evicting the least recently used files.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Pick up whatever a previous process left behind, oldest first
+        files = [
+            (entry.stat().st_mtime, entry.name, entry.stat().st_size)
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and not entry.name.startswith(".")
+        ]
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.bytes += size
+        self._evict()
+
+    def path(self, key: str) -> Optional[Path]:
+        """Path to the cached file for `key`, if we have it"""
+        name = self._name(key)
+        if name not in self._entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(name)
+        return self.directory / name
+
+    def __contains__(self, key: str) -> bool:
+        return self._name(key) in self._entries
+
+    async def write(self, key: str, chunks: AsyncIterator[bytes]) -> Path:
+        """Stream `chunks` into the cache under `key`, returning the final path"""
+        temp_path = self.reserve()
+        size = 0
+        try:
+            with open(temp_path, "wb") as f:
+                async for chunk in chunks:
+                    # Keep disk writes off the event loop
+                    await asyncio.to_thread(f.write, chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        return self.commit(key, temp_path, size)
+
+    def reserve(self) -> Path:
+        """A fresh temp file in the cache dir to write a new entry into"""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".partial-")
+        os.close(fd)
+        os.chmod(temp_path, 0o644)
+        return Path(temp_path)
+
+    def commit(self, key: str, temp_path: Path, size: int) -> Path:
+        """Atomically move a finished temp file into place under `key`"""
+        path = self.directory / self._name(key)
+        os.replace(temp_path, path)
+        self.add(key, size)
+        return path
+
+    def add(self, key: str, size: int):
+        """Account for a file that's been put in the cache dir"""
+        name = self._name(key)
+        previous = self._entries.pop(name, None)
+        if previous is not None:
+            self.bytes -= previous
+        self._entries[name] = size
+        self.bytes += size
+        self._evict(keep=name)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.bytes > self.max_bytes and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self.directory / name)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _name(key: str) -> str:
+        if SAFE_KEY.match(key) and not key.startswith("."):
+            return key
+        return hashlib.sha1(key.encode()).hexdigest()
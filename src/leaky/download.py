@@ -0,0 +1,115 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from .disk import DiskCache
+
+# How much to read from a partial file at a time
+CHUNK_SIZE = 64 * 1024
+
+
+class Download:
+    """
+    A file being written into a DiskCache that readers can follow as it grows.
+    Once every byte is written it's committed to the cache under `key`.
+    """
+
+    def __init__(self, cache: DiskCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.temp_path = cache.reserve()
+
+        # Filled in once the upstream response starts
+        self.size: Optional[int] = None
+        self.media_type: Optional[str] = None
+
+        self.written = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.path: Optional[Path] = None
+
+        self.started = asyncio.Event()
+        self._progress = asyncio.Condition()
+
+    def begin(self, size: Optional[int], media_type: Optional[str]):
+        self.size = size
+        self.media_type = media_type
+        self.started.set()
+
+    async def write(self, chunks: AsyncIterator[bytes]) -> Path:
+        """Write `chunks` to disk, waking readers as each one lands"""
+        try:
+            with open(self.temp_path, "wb") as f:
+                async for chunk in chunks:
+                    await asyncio.to_thread(self._append, f, chunk)
+                    async with self._progress:
+                        self.written += len(chunk)
+                        self._progress.notify_all()
+
+            self.path = self.cache.commit(self.key, self.temp_path, self.written)
+            return self.path
+        except BaseException as e:
+            self.error = e
+            self.temp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            await self._finish()
+
+    async def fail(self, error: BaseException):
+        """Give up before anything was written"""
+        if self.done:
+            return
+        self.error = error
+        self.temp_path.unlink(missing_ok=True)
+        await self._finish()
+
+    async def wait_for(self, offset: int) -> int:
+        """Wait until the byte at `offset` is on disk, returning bytes written"""
+        async with self._progress:
+            await self._progress.wait_for(lambda: self.written > offset or self.done)
+        if self.error is not None:
+            raise self._failed()
+        return self.written
+
+    async def read(self, start: int, end: int) -> AsyncIterator[bytes]:
+        """Read bytes `start` through `end` (inclusive), following the download"""
+        # A failed download has already removed its temp file
+        if self.error is not None:
+            raise self._failed()
+        # Open whichever file exists right now -- the fd survives the rename
+        try:
+            fd = os.open(self.path or self.temp_path, os.O_RDONLY)
+        except FileNotFoundError as e:
+            raise self._failed() from e
+        try:
+            position = start
+            while position <= end:
+                written = await self.wait_for(position)
+                length = min(CHUNK_SIZE, written - position, end - position + 1)
+                if length <= 0:
+                    break
+                chunk = await asyncio.to_thread(os.pread, fd, length, position)
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+
+    def _failed(self) -> IOError:
+        error = IOError(f"download of {self.key} failed")
+        error.__cause__ = self.error
+        return error
+
+    async def _finish(self):
+        self.started.set()
+        async with self._progress:
+            self.done = True
+            self._progress.notify_all()
+
+    @staticmethod
+    def _append(f, chunk: bytes):
+        f.write(chunk)
+        # Readers go through their own fd, make sure they can see this
+        f.flush()
@@ -0,0 +1,104 @@
+import hashlib
+from typing import Dict, Generic, Iterable, List, Optional, Protocol, Tuple, TypeVar
+
+from .models import BlogPost
+
+
+class Indexable(Protocol):
+    @property
+    def path(self) -> str: ...
+
+    @property
+    def cid(self) -> Optional[str]: ...
+
+    def model_dump_json(self) -> str: ...
+
+
+T = TypeVar("T", bound=Indexable)
+
+
+def _fingerprint(entry: Indexable) -> str:
+    # Everything that gets rendered for an entry, not just its CID -- titles,
+    #  tags and dates live in the listing, outside the content
+    return entry.model_dump_json()
+
+
+def _digest(fingerprints: Iterable[str]) -> str:
+    digest = hashlib.sha1()
+    for fingerprint in fingerprints:
+        digest.update(f"{fingerprint}\n".encode())
+    return digest.hexdigest()
+
+
+class PathIndex(Generic[T]):
+    """
+    Immutable snapshot of one collection: entries sorted newest first, plus a
+    path -> entry dict for O(1) lookups.
+    Indexes are built whole from a listing and swapped in by reference,
+    so readers never see a half-built one.
+    """
+
+    __slots__ = ("entries", "by_path", "version")
+
+    def __init__(self, entries: List[T], version: Optional[str] = None):
+        self.entries = entries
+        self.by_path: Dict[str, T] = {entry.path: entry for entry in entries}
+        # Stand-in version for when we don't know the directory CID
+        self.version = version or _digest(_fingerprint(entry) for entry in entries)
+
+    def get(self, path: str) -> Optional[T]:
+        return self.by_path.get(path.strip("/"))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path.strip("/") in self.by_path
+
+
+class BlogIndex(PathIndex[BlogPost]):
+    """
+    Blog posts, plus secondary indexes of them by category and by tag.
+    Each is a `PathIndex` of its own (newest first, versioned by what's in
+    it), so a filtered view is a dict lookup and a slice. Built along with
+    the listing, so they always agree with it.
+    """
+
+    __slots__ = ("by_category", "by_tag")
+
+    def __init__(self, entries: List[BlogPost], version: Optional[str] = None):
+        super().__init__(entries, version)
+        categories: Dict[str, List[BlogPost]] = {}
+        tags: Dict[str, List[BlogPost]] = {}
+        fingerprints = {post.path: _fingerprint(post) for post in entries}
+        for post in entries:
+            categories.setdefault(post.category, []).append(post)
+            for tag in dict.fromkeys(post.tags):
+                tags.setdefault(tag, []).append(post)
+        # Versioned by just their own posts, so they outlive changes elsewhere
+        self.by_category = {
+            category: self._subindex(posts, fingerprints)
+            for category, posts in categories.items()
+        }
+        self.by_tag = {
+            tag: self._subindex(posts, fingerprints) for tag, posts in tags.items()
+        }
+
+    @staticmethod
+    def _subindex(
+        posts: List[BlogPost], fingerprints: Dict[str, str]
+    ) -> PathIndex[BlogPost]:
+        return PathIndex(posts, _digest(fingerprints[post.path] for post in posts))
+
+    def category(self, category: str) -> Optional[PathIndex[BlogPost]]:
+        return self.by_category.get(category)
+
+    def tag(self, tag: str) -> Optional[PathIndex[BlogPost]]:
+        return self.by_tag.get(tag)
+
+    def tag_counts(self) -> List[Tuple[str, int]]:
+        """(tag, number of posts) for every tag, most used first"""
+        return sorted(
+            ((tag, len(posts)) for tag, posts in self.by_tag.items()),
+            key=lambda count: (-count[1], count[0]),
+        )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Optional, Self
 
 
 class FileObject(BaseModel):
@@ -7,3 +7,21 @@ class FileObject(BaseModel):
     path: str
     is_dir: bool
     object: Optional[dict]
+
+
+class ListingModel(BaseModel):
+    """Base for models parsed out of leaky listings, which come by the thousand"""
+
+    @classmethod
+    def trusted(cls, **values: Any) -> Self:
+        """
+        Build a model from values the caller has already checked, skipping
+        pydantic entirely -- `model_construct` without its per-field work.
+        Every field has to be given.
+        """
+        model = cls.__new__(cls)
+        object.__setattr__(model, "__dict__", values)
+        object.__setattr__(model, "__pydantic_fields_set__", set(values))
+        object.__setattr__(model, "__pydantic_extra__", None)
+        object.__setattr__(model, "__pydantic_private__", None)
+        return model
@@ -1,8 +1,11 @@
 from datetime import datetime
-from typing import List, Optional
+from operator import attrgetter
+from typing import Any, List, Optional
 from pydantic import BaseModel
 import httpx
-from ..utils import parse_date
+from ..client import use_client
+from .base import ListingModel
+from ..utils import decode_json, parse_date
 
 
 class BlogPostMetadata(BaseModel):
@@ -10,7 +13,7 @@ class BlogPostMetadata(BaseModel):
     description: str
 
 
-class BlogPost(BaseModel):
+class BlogPost(ListingModel):
     name: str
     title: str
     description: str
@@ -18,64 +21,99 @@ class BlogPost(BaseModel):
     content: Optional[str] = None
     category: str = "thoughts"  # Default category
     tags: List[str] = []  # Tags for the blog post
+    cid: Optional[str] = None  # Content id of this version of the post
+
+    @property
+    def path(self) -> str:
+        """Where this post lives under `/blog`, i.e. `category/name`"""
+        return f"{self.category}/{self.name}"
+
+    @classmethod
+    def from_listing(
+        cls, items: Any, category: Optional[str] = None
+    ) -> List["BlogPost"]:
+        """
+        Parse a deep `/blog` listing into posts, newest first. Items are checked
+        here and the models built with `trusted`, skipping pydantic validation --
+        at thousands of posts it was most of the cost of a refresh.
+        """
+        posts = []
+
+        for item in items:
+            if not isinstance(item, dict) or item.get("is_dir", True):
+                continue
+
+            # Extract category and filename from path
+            path = item.get("path")
+            if not isinstance(path, str):
+                continue
+            # Remove leading slash and split
+            path_parts = path.lstrip("/").split("/")
+            if len(path_parts) != 2:
+                continue
+
+            item_category, filename = path_parts
+
+            # Filter by category if specified
+            if category and item_category != category:
+                continue
+
+            data = item.get("object")
+            if not isinstance(data, dict):
+                continue
+            properties = data.get("properties")
+            if not isinstance(properties, dict):
+                continue
+            title = properties.get("title")
+            description = properties.get("description")
+            if not isinstance(title, str) or not isinstance(description, str):
+                continue
+
+            created_at = parse_date(data.get("created_at"))
+            if created_at is None:
+                continue
+
+            tags = properties.get("tags")
+            cid = item.get("cid")
+            posts.append(
+                cls.trusted(
+                    name=filename,
+                    title=title,
+                    description=description,
+                    created_at=created_at,
+                    content=None,
+                    category=item_category,
+                    tags=(
+                        [tag for tag in tags if isinstance(tag, str)]
+                        if isinstance(tags, list)
+                        else []
+                    ),
+                    cid=cid if isinstance(cid, str) else None,
+                )
+            )
+
+        return sorted(posts, key=attrgetter("created_at"), reverse=True)
 
     @classmethod
     async def read_all(
-        cls, base_url: str, category: Optional[str] = None
+        cls,
+        base_url: str,
+        category: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
     ) -> List["BlogPost"]:
-        async with httpx.AsyncClient() as client:
+        async with use_client(client) as http:
             # Use deep=true to fetch all posts in one request
             url = f"{base_url}/blog?deep=true"
-            response = await client.get(url)
+            response = await http.get(url)
             if response.status_code != 200:
                 return []
 
-            items = response.json()
-            posts = []
-
-            for item in items:
-                try:
-                    if not isinstance(item, dict) or item.get("is_dir", True):
-                        continue
-
-                    # Extract category and filename from path
-                    path = item.get("path", "")
-                    # Remove leading slash and split
-                    path_parts = path.lstrip("/").split("/")
-                    if len(path_parts) != 2:
-                        continue
-
-                    item_category, filename = path_parts
-
-                    # Filter by category if specified
-                    if category and item_category != category:
-                        continue
-
-                    data = item.get("object", {})
-                    if not data or "properties" not in data or "created_at" not in data:
-                        continue
-
-                    created_at = parse_date(data["created_at"])
-                    if created_at is None:
-                        continue
-
-                    posts.append(
-                        cls(
-                            name=filename,
-                            title=data["properties"]["title"],
-                            description=data["properties"]["description"],
-                            created_at=created_at,
-                            category=item_category,
-                            tags=data["properties"].get("tags", []),
-                        )
-                    )
-                except (KeyError, ValueError):
-                    continue
-
-            return sorted(posts, key=lambda x: x.created_at, reverse=True)
+            return cls.from_listing(decode_json(response.content), category)
 
     @classmethod
-    async def read_one(cls, base_url: str, name: str) -> Optional["BlogPost"]:
+    async def read_one(
+        cls, base_url: str, name: str, client: Optional[httpx.AsyncClient] = None
+    ) -> Optional["BlogPost"]:
         # Extract category from name
         parts = name.split("/")
         if len(parts) != 2:
@@ -83,9 +121,9 @@ class BlogPost(BaseModel):
 
         category, post_name = parts
 
-        async with httpx.AsyncClient() as client:
+        async with use_client(client) as http:
             # Get metadata from category endpoint
-            meta_response = await client.get(f"{base_url}/blog/{category}")
+            meta_response = await http.get(f"{base_url}/blog/{category}")
             if meta_response.status_code != 200:
                 return None
 
@@ -112,7 +150,7 @@ class BlogPost(BaseModel):
                 return None
 
             # Get content
-            content_response = await client.get(
+            content_response = await http.get(
                 f"{base_url}/blog/{category}/{post_name}?html=true"
             )
             if content_response.status_code != 200:
@@ -126,4 +164,5 @@ class BlogPost(BaseModel):
                 content=content_response.text,
                 category=category,
                 tags=data["properties"].get("tags", []),
+                cid=post_item.get("cid"),
             )
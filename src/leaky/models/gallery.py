@@ -1,74 +1,101 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from operator import attrgetter
+from typing import Any, List, Optional
+from pydantic import Field
 import httpx
-from ..utils import parse_date
+from ..client import use_client
+from .base import ListingModel
+from ..utils import decode_json, parse_date
 
 
-class GalleryImage(BaseModel):
+class GalleryImage(ListingModel):
     name: str
     created_at: datetime
     cid: str
     base_url: str = Field(exclude=True)
+    # Set when ondo proxies gallery media itself, see `/gallery/media`
+    media_url: Optional[str] = Field(default=None, exclude=True)
+
+    @property
+    def path(self) -> str:
+        """Where this image lives under `/gallery`, i.e. `category/name`"""
+        return self.name
 
     def get_url(self, thumbnail: bool = False) -> str:
         """Get the URL for the image, optionally as thumbnail"""
+        if self.media_url is not None:
+            # Versioned by CID so the proxied response can be cached forever
+            suffix = "&thumbnail=true" if thumbnail else ""
+            return f"{self.media_url}/{self.name}?v={self.cid}{suffix}"
+
         suffix = "?thumbnail=true" if thumbnail else ""
         return f"{self.base_url}/gallery/{self.name}{suffix}"
 
     @classmethod
-    async def read_all(cls, base_url: str) -> List["GalleryImage"]:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{base_url}/gallery?deep=true")
-
-            if response.status_code != 200:
-                return []
-
-            items = response.json()
-            images = []
-
-            for item in items:
-                try:
-                    if not isinstance(item, dict) or item.get("is_dir", True):
-                        continue
-
-                    name = item["path"]
-                    data = item.get("object", {})
+    def from_listing(
+        cls, items: Any, base_url: str, media_url: Optional[str] = None
+    ) -> List["GalleryImage"]:
+        """
+        Parse a deep `/gallery` listing into images, newest first. Built without
+        validation, see `BlogPost.from_listing`
+        """
+        images = []
+
+        for item in items:
+            if not isinstance(item, dict) or item.get("is_dir", True):
+                continue
+
+            name = item.get("path")
+            cid = item.get("cid")
+            data = item.get("object")
+            if not isinstance(name, str) or not isinstance(cid, str):
+                continue
+            if not isinstance(data, dict):
+                continue
+
+            created_at = parse_date(data.get("created_at"))
+            if created_at is None:
+                continue
 
-                    if not data or "created_at" not in data:
-                        continue
+            images.append(
+                cls.trusted(
+                    # Remove leading slashes from name
+                    name=name.lstrip("/"),
+                    created_at=created_at,
+                    cid=cid,
+                    base_url=base_url,
+                    media_url=media_url,
+                )
+            )
 
-                    created_at = parse_date(data["created_at"])
-                    if created_at is None:
-                        continue
+        return sorted(images, key=attrgetter("created_at"), reverse=True)
 
-                    # Remove leading slashes from name
-                    clean_name = name.lstrip("/")
+    @classmethod
+    async def read_all(
+        cls, base_url: str, client: Optional[httpx.AsyncClient] = None
+    ) -> List["GalleryImage"]:
+        async with use_client(client) as http:
+            response = await http.get(f"{base_url}/gallery?deep=true")
 
-                    images.append(
-                        cls(
-                            name=clean_name,
-                            created_at=created_at,
-                            cid=item["cid"],
-                            base_url=base_url,
-                        )
-                    )
-                except (KeyError, ValueError):
-                    continue
+            if response.status_code != 200:
+                return []
 
-            return sorted(images, key=lambda x: x.created_at, reverse=True)
+            return cls.from_listing(decode_json(response.content), base_url)
 
     @classmethod
     async def read_one(
-        cls, base_url: str, category: str, name: str
+        cls,
+        base_url: str,
+        category: str,
+        name: str,
+        client: Optional[httpx.AsyncClient] = None,
     ) -> Optional["GalleryImage"]:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{base_url}/gallery/{category}")
+        async with use_client(client) as http:
+            response = await http.get(f"{base_url}/gallery/{category}")
             if response.status_code != 200:
                 return None
 
             items = response.json()
-            print(f"JESUS FUCKING CHRIST READING gallery_item: {items}")
             full_path = f"{name}"
             image_item = next(
                 (
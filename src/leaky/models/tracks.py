@@ -1,59 +1,84 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from operator import attrgetter
+from typing import Any, List, Optional
+from pydantic import Field
 import httpx
-from ..utils import parse_date
+from ..client import use_client
+from .base import ListingModel
+from ..utils import decode_json, parse_date
 
 
-class AudioTrack(BaseModel):
+class AudioTrack(ListingModel):
     name: str
     created_at: datetime
     base_url: str = Field(exclude=True)
+    cid: Optional[str] = None
+    # Set when ondo proxies music itself, see `/music/media`
+    media_url: Optional[str] = Field(default=None, exclude=True)
+
+    @property
+    def path(self) -> str:
+        return self.name
 
     def get_url(self) -> str:
+        if self.media_url is not None:
+            version = f"?v={self.cid}" if self.cid else ""
+            return f"{self.media_url}/{self.name}{version}"
         return f"{self.base_url}/music/me/{self.name}"
 
     @classmethod
-    async def read_all(cls, base_url: str) -> List["AudioTrack"]:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{base_url}/music/me")
-            if response.status_code != 200:
-                return []
-
-            items = response.json()
-            tracks = []
-
-            for item in items:
-                try:
-                    if not isinstance(item, dict) or item.get("is_dir", True):
-                        continue
-
-                    name = item["path"]
-                    data = item.get("object", {})
-
-                    if not data or "created_at" not in data:
-                        continue
+    def from_listing(
+        cls, items: Any, base_url: str, media_url: Optional[str] = None
+    ) -> List["AudioTrack"]:
+        """
+        Parse a `/music/me` listing into tracks, newest first. Built without
+        validation, see `BlogPost.from_listing`
+        """
+        tracks = []
+
+        for item in items:
+            if not isinstance(item, dict) or item.get("is_dir", True):
+                continue
+
+            name = item.get("path")
+            data = item.get("object")
+            if not isinstance(name, str) or not isinstance(data, dict):
+                continue
+
+            created_at = parse_date(data.get("created_at"))
+            if created_at is None:
+                continue
+
+            cid = item.get("cid")
+            tracks.append(
+                cls.trusted(
+                    name=name,
+                    created_at=created_at,
+                    base_url=base_url,
+                    cid=cid if isinstance(cid, str) else None,
+                    media_url=media_url,
+                )
+            )
 
-                    created_at = parse_date(data["created_at"])
-                    if created_at is None:
-                        continue
+        return sorted(tracks, key=attrgetter("created_at"), reverse=True)
 
-                    tracks.append(
-                        cls(
-                            name=name,
-                            created_at=created_at,
-                            base_url=base_url,
-                        )
-                    )
-                except (KeyError, ValueError):
-                    continue
+    @classmethod
+    async def read_all(
+        cls, base_url: str, client: Optional[httpx.AsyncClient] = None
+    ) -> List["AudioTrack"]:
+        async with use_client(client) as http:
+            response = await http.get(f"{base_url}/music/me")
+            if response.status_code != 200:
+                return []
 
-            return sorted(tracks, key=lambda x: x.created_at, reverse=True)
+            return cls.from_listing(decode_json(response.content), base_url)
 
     @classmethod
-    async def read_one(cls, base_url: str, name: str) -> Optional["AudioTrack"]:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{base_url}/music/me")
+    async def read_one(
+        cls, base_url: str, name: str, client: Optional[httpx.AsyncClient] = None
+    ) -> Optional["AudioTrack"]:
+        async with use_client(client) as http:
+            response = await http.get(f"{base_url}/music/me")
             if response.status_code != 200:
                 return None
 
@@ -82,4 +107,5 @@ class AudioTrack(BaseModel):
                 name=name,
                 created_at=created_at,
                 base_url=base_url,
+                cid=track_item.get("cid"),
             )
@@ -0,0 +1,74 @@
+import base64
+import bisect
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Generic, List, Optional, Protocol, Tuple, TypeVar
+
+
+class Pageable(Protocol):
+    @property
+    def path(self) -> str: ...
+
+    @property
+    def created_at(self) -> datetime: ...
+
+
+T = TypeVar("T", bound=Pageable)
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors we didn't hand out"""
+
+
+@dataclass
+class Page(Generic[T]):
+    entries: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(entry: Pageable) -> str:
+    """Opaque cursor pointing just past `entry`"""
+    raw = json.dumps([entry.path, entry.created_at.isoformat()]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        path, created_at = json.loads(raw)
+        return path, datetime.fromisoformat(created_at)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def paginate(entries: List[T], cursor: Optional[str], limit: int) -> Page[T]:
+    """
+    One page of a newest-first list, starting after `cursor`.
+    A `limit` of 0 means everything that's left.
+    The cursor holds the last entry's timestamp as well as its path, so we can
+    find our place by bisecting even if that entry has since been removed.
+    """
+    start = 0
+    if cursor:
+        path, created_at = decode_cursor(cursor)
+        timestamp = created_at.timestamp()
+        start = bisect.bisect_left(
+            entries, -timestamp, key=lambda entry: -entry.created_at.timestamp()
+        )
+        # Skip past anything sharing the cursor's timestamp, up to the entry itself
+        end_of_ties = start
+        while (
+            end_of_ties < len(entries)
+            and entries[end_of_ties].created_at.timestamp() == timestamp
+        ):
+            end_of_ties += 1
+        start = next(
+            (i + 1 for i in range(start, end_of_ties) if entries[i].path == path),
+            end_of_ties,
+        )
+
+    end = start + limit if limit > 0 else len(entries)
+    page = entries[start:end]
+    next_cursor = encode_cursor(page[-1]) if page and end < len(entries) else None
+    return Page(entries=page, next_cursor=next_cursor)
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .models import BlogPost, GalleryImage
+from .store import LeakyStore
+
+logger = logging.getLogger(__name__)
+
+# Most warm-ups waiting at once, anything past this is dropped
+MAX_PENDING = 64
+
+# Requests in flight at which the server counts as busy. Not 1, or a long
+#  audio stream would hold prefetching up for its whole length
+BUSY_REQUESTS = 4
+
+# How long to wait before checking again while the server is busy (seconds)
+BUSY_WAIT = 0.05
+
+Warm = Callable[[], Awaitable[Any]]
+
+
+class Prefetcher:
+    """
+    Warms the caches behind whatever's likely to be opened next -- the top
+    few entries of a list that was just rendered -- so it's there before
+    it's asked for.
+    Warm-ups wait in a bounded queue and run one at a time, and only while
+    the server isn't busy, so they never compete with real requests.
+    """
+
+    def __init__(
+        self,
+        store: LeakyStore,
+        count: int = 4,
+        max_pending: int = MAX_PENDING,
+        in_flight: Optional[Callable[[], float]] = None,
+    ):
+        """
+        - count - how many entries from the top of a list to warm
+        - in_flight - how many requests are being handled right now
+        """
+        self.store = store
+        self.count = count
+        self.in_flight = in_flight or (lambda: 0)
+        self._queue: asyncio.Queue[Tuple[str, Warm]] = asyncio.Queue(max_pending)
+        # Keys queued or running, so each thing is only warmed once at a time
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.scheduled = 0
+        self.dropped = 0
+        self.warmed = 0
+        self.errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, key: str, warm: Warm) -> bool:
+        """Queue `warm` unless `key` already is, returning whether it was"""
+        if key in self._pending:
+            return False
+        try:
+            self._queue.put_nowait((key, warm))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(key)
+        self.scheduled += 1
+        return True
+
+    def posts(self, posts: List[BlogPost]):
+        """Warm the content of the first posts in a list"""
+        store = self.store
+        for post in posts[: self.count]:
+            if not post.cid or post.cid in store.content:
+                continue
+            self.schedule(f"post:{post.cid}", self._post(post))
+
+    def images(self, images: List[GalleryImage]):
+        """Pull the first images in a list into the media cache, if we proxy them"""
+        media = self.store.media
+        if media is None or "gallery" not in self.store.media_urls:
+            return
+        for image in images[: self.count]:
+            if image.cid in media:
+                continue
+            self.schedule(f"image:{image.cid}", self._image(image))
+
+    def _post(self, post: BlogPost) -> Warm:
+        return lambda: self.store.post(post.category, post.name)
+
+    def _image(self, image: GalleryImage) -> Warm:
+        return lambda: self.store.image_file(image)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "warmed": self.warmed,
+            "errors": self.errors,
+        }
+
+    async def _run(self):
+        while True:
+            key, warm = await self._queue.get()
+            try:
+                while self.in_flight() >= BUSY_REQUESTS:
+                    await asyncio.sleep(BUSY_WAIT)
+                await warm()
+                self.warmed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"failed to prefetch {key}: {e}")
+            finally:
+                self._pending.discard(key)
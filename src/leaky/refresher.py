@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from .shared import LeaderLock
+from .store import COLLECTIONS, LeakyStore
+
+logger = logging.getLogger(__name__)
+
+# Which top level leaky directory versions each collection
+COLLECTION_DIRS = {
+    "blog": "blog",
+    "gallery": "gallery",
+    "music": "music",
+}
+
+
+class Refresher:
+    """
+    Background task that polls the CIDs of leaky's top level directories and
+    only re-reads a collection once its CID has changed.
+    With several workers only the one holding `leader` polls leaky, the rest
+    follow the listings it writes to the shared cache.
+    """
+
+    def __init__(
+        self,
+        store: LeakyStore,
+        interval: float = 30.0,
+        leader: Optional[LeaderLock] = None,
+    ):
+        self.store = store
+        self.interval = interval
+        self.leader = leader
+        self._task: Optional[asyncio.Task] = None
+
+        self.polls = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def poll(self) -> List[str]:
+        """Check leaky once, returning the collections that were refreshed"""
+        self.polls += 1
+        shared = self.store.shared
+        if self.leader is not None and shared is not None and not self.leader.acquire():
+            # Another worker is polling leaky, its listings are in the shared
+            #  cache for us to pick up
+            versions = await shared.listing_versions()
+        else:
+            root = await self.store.root_versions()
+            versions = {
+                collection: root[directory]
+                for collection, directory in COLLECTION_DIRS.items()
+                if directory in root
+            }
+
+        changed = []
+        for collection in COLLECTIONS:
+            version = versions.get(collection)
+            if version is None or version == self.store.versions.get(collection):
+                continue
+            await self.store.refresh(collection, version)
+            self.refreshes += 1
+            changed.append(collection)
+        return changed
+
+    async def _run(self):
+        while True:
+            try:
+                changed = await self.poll()
+                if changed:
+                    logger.info(f"refreshed leaky collections: {', '.join(changed)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving what we have and try again next round
+                self.errors += 1
+                logger.warning(f"failed to poll leaky for changes: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,350 @@
+import asyncio
+import bisect
+import heapq
+import html
+import logging
+import math
+import re
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+from .index import PathIndex
+from .models import BlogPost
+from .shared import LeaderLock
+from .store import LeakyStore
+
+logger = logging.getLogger(__name__)
+
+# How much a term counts for in each part of a post
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "description": 2.0,
+    "content": 1.0,
+}
+
+# BM25 parameters, the usual defaults
+K1 = 1.2
+B = 0.75
+
+# Prefix matches count for less than the word itself
+PREFIX_WEIGHT = 0.6
+# Most vocabulary terms a single query term expands to
+MAX_EXPANSIONS = 16
+# Shorter query terms only match whole words
+MIN_PREFIX = 3
+# Most terms and prefixes whose scores are kept between queries
+MAX_CACHED_SCORES = 4096
+
+# Posts read from leaky at once while indexing content
+CONTENT_CONCURRENCY = 4
+
+# With several workers, how long the others wait between rounds of picking
+#  up what the leader has read (seconds), and how many rounds before they
+#  give up and read the rest from leaky themselves
+FOLLOW_WAIT = 5.0
+FOLLOW_ROUNDS = 12
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its of "
+    "on or so that the their then there these this to was were will with".split()
+)
+
+_TOKEN = re.compile(r"\w+")
+_HIDDEN = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]*>")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words in `text`, minus stopwords"""
+    return [
+        token
+        for token in _TOKEN.findall(text.lower())
+        if token not in STOPWORDS and len(token) < 64
+    ]
+
+
+def strip_html(content: str) -> str:
+    """The text of a rendered post"""
+    return html.unescape(_TAG.sub(" ", _HIDDEN.sub(" ", content)))
+
+
+@dataclass
+class Document:
+    cid: Optional[str]
+    # term -> weighted count across fields
+    terms: Dict[str, float]
+    length: float
+    has_content: bool
+
+
+class SearchIndex:
+    """
+    Inverted index over blog posts ranked with BM25, where every field
+    feeds one weighted bag of words.
+    Documents are added and removed one at a time, so keeping it current
+    costs whatever changed rather than a rebuild.
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, Document] = {}
+        # term -> path -> weighted count
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self._total_length = 0.0
+        # Sorted vocabulary for prefix matching, rebuilt when terms come and go
+        self._vocabulary: Optional[List[str]] = None
+        # path -> the length part of BM25's denominator, rebuilt on change
+        self._norms: Optional[Dict[str, float]] = None
+        # term (or prefix*) -> path -> BM25 score, worked out on first use
+        #  after a change
+        self._impacts: Dict[str, Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, post: BlogPost, text: Optional[str] = None):
+        """Index `post`, replacing whatever was indexed at its path"""
+        self.remove(post.path)
+        fields = {
+            "title": post.title,
+            "tags": " ".join(post.tags),
+            "description": post.description,
+            "content": text or "",
+        }
+        terms: Dict[str, float] = {}
+        length = 0.0
+        for field, value in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(value):
+                terms[token] = terms.get(token, 0.0) + weight
+                length += weight
+
+        for term, count in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._vocabulary = None
+            postings[post.path] = count
+        self.documents[post.path] = Document(
+            post.cid, terms, length, has_content=text is not None
+        )
+        self._total_length += length
+        self._changed()
+
+    def remove(self, path: str):
+        document = self.documents.pop(path, None)
+        if document is None:
+            return
+        for term in document.terms:
+            postings = self.postings[term]
+            del postings[path]
+            if not postings:
+                del self.postings[term]
+                self._vocabulary = None
+        self._total_length -= document.length
+        self._changed()
+
+    def _changed(self):
+        # Every score depends on the average length, so they all go
+        self._norms = None
+        self._impacts = {}
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """The best matching (path, score)s for `query`, best first"""
+        if not self.documents:
+            return []
+
+        matches = [self._token_scores(token) for token in set(tokenize(query))]
+        if len(matches) == 1:
+            # A single word needs no adding up
+            return heapq.nlargest(limit, matches[0].items(), key=itemgetter(1))
+
+        scores: Dict[str, float] = {}
+        for match in matches:
+            get = scores.get
+            for path, score in match.items():
+                scores[path] = get(path, 0.0) + score
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+
+    def _token_scores(self, token: str) -> Dict[str, float]:
+        """path -> score for one query word, counting words it's a prefix of"""
+        if len(token) < MIN_PREFIX:
+            return self._scores(token)
+
+        key = f"{token}*"
+        scores = self._impacts.get(key)
+        if scores is not None:
+            return scores
+
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect.bisect_right(vocabulary, token)
+        scores = dict(self._scores(token))
+        for term in vocabulary[start : start + MAX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            # A document counts once per query word, by its best match
+            get = scores.get
+            for path, score in self._scores(term).items():
+                score *= PREFIX_WEIGHT
+                if score > get(path, 0.0):
+                    scores[path] = score
+        self._remember(key, scores)
+        return scores
+
+    def _scores(self, term: str) -> Dict[str, float]:
+        """path -> BM25 score of `term` for every document it's in"""
+        scores = self._impacts.get(term)
+        if scores is None:
+            postings = self.postings.get(term)
+            if postings is None:
+                return {}
+            norms = self._lengths()
+            found = len(postings)
+            idf = math.log(1 + (len(self.documents) - found + 0.5) / (found + 0.5))
+            idf *= K1 + 1
+            scores = {
+                path: idf * count / (count + norms[path])
+                for path, count in postings.items()
+            }
+            self._remember(term, scores)
+        return scores
+
+    def _remember(self, key: str, scores: Dict[str, float]):
+        # Queries are open ended, so start over rather than grow forever
+        if len(self._impacts) >= MAX_CACHED_SCORES:
+            self._impacts = {}
+        self._impacts[key] = scores
+
+    def _lengths(self) -> Dict[str, float]:
+        if self._norms is None:
+            average = self._total_length / len(self.documents) or 1.0
+            self._norms = {
+                path: K1 * (1 - B + B * document.length / average)
+                for path, document in self.documents.items()
+            }
+        return self._norms
+
+
+class PostSearch:
+    """
+    Keeps a `SearchIndex` in step with the blog listing.
+    Posts are indexed by their metadata as soon as they're listed, and their
+    content is read in the background and indexed as it arrives. Only posts
+    whose CID changed are touched when the listing does.
+    """
+
+    def __init__(
+        self,
+        store: LeakyStore,
+        concurrency: int = CONTENT_CONCURRENCY,
+        leader: Optional[LeaderLock] = None,
+    ):
+        self.store = store
+        self.index = SearchIndex()
+        self.concurrency = concurrency
+        # With several workers only the leader reads content from leaky
+        self.leader = leader
+        # The listing the index was last synced with
+        self.listing: PathIndex = PathIndex([])
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._syncs: Set[asyncio.Task] = set()
+
+    def schedule(self):
+        """Sync in the background, e.g. when the listing has changed"""
+        task = asyncio.create_task(self._sync())
+        self._syncs.add(task)
+        task.add_done_callback(self._syncs.discard)
+
+    async def _sync(self):
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.warning(f"failed to sync the search index: {e}")
+
+    async def sync(self):
+        """Bring the index up to date with the blog listing"""
+        listing = await self.store.index("blog")
+        if listing.version == self.listing.version:
+            return
+
+        for path in list(self.index.documents):
+            if path not in listing:
+                self.index.remove(path)
+                self._pending.discard(path)
+        for post in listing.entries:
+            document = self.index.documents.get(post.path)
+            if document is not None and document.cid == post.cid:
+                continue
+            # Searchable by title and tags straight away
+            self.index.add(post)
+            self._pending.add(post.path)
+        self.listing = listing
+
+        if self._pending and self._task is None:
+            self._task = asyncio.create_task(self._read_content())
+
+    async def search(self, query: str, limit: int = 20) -> List[Tuple[BlogPost, float]]:
+        await self.sync()
+        results = []
+        for path, score in self.index.search(query, limit):
+            post = self.listing.get(path)
+            if post is not None:
+                results.append((post, score))
+        return results
+
+    async def _read_content(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def read(path: str, upstream: bool):
+            async with semaphore:
+                post = self.listing.get(path)
+                if post is None:
+                    return
+                # Every post passes through here once, keep them out of the
+                #  content cache so they don't push out what's being read
+                full_post = await self.store.post(
+                    post.category, post.name, upstream, cache=False
+                )
+            document = self.index.documents.get(path)
+            # Skip anything that changed while we were reading it
+            if full_post is None or document is None or document.cid != post.cid:
+                return
+            self._pending.discard(path)
+            self.index.add(post, strip_html(full_post.content or ""))
+
+        try:
+            rounds = 0
+            while True:
+                # Followers pick up what the leader shares rather than every
+                #  worker reading every post from leaky
+                upstream = (
+                    self.leader is None
+                    or self.leader.acquire()
+                    or rounds >= FOLLOW_ROUNDS
+                )
+                # Posts that can't be read are tried again when the listing changes
+                tried: Set[str] = set()
+                while self._pending - tried:
+                    paths = self._pending - tried
+                    tried |= paths
+                    await asyncio.gather(*(read(path, upstream) for path in paths))
+                if upstream or not self._pending:
+                    break
+                rounds += 1
+                await asyncio.sleep(FOLLOW_WAIT)
+            logger.info(f"indexed {len(self.index)} posts for search")
+        except Exception as e:
+            logger.warning(f"failed to index post content: {e}")
+        finally:
+            self._task = None
+
+    async def close(self):
+        tasks = [*self._syncs, *([self._task] if self._task is not None else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
@@ -0,0 +1,267 @@
+import asyncio
+import fcntl
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    collection TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    content BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_stored_at ON blobs (stored_at);
+"""
+
+# How long a read waits on another worker's lock before it's counted as a
+#  miss (seconds). Reads are on the request path, rendering beats waiting
+READ_TIMEOUT = 0.05
+
+# Writes happen off the request path, so they can afford to wait their turn
+WRITE_TIMEOUT = 5.0
+
+# Most writes committed in one transaction
+WRITE_BATCH = 128
+
+# Most writes waiting for the writer, anything past this is dropped
+MAX_PENDING_WRITES = 1024
+
+_STOP = object()
+
+
+class SharedCache:
+    """
+    Cache shared by every worker process on this machine, kept in a SQLite
+    file in WAL mode so readers never wait on each other or on a writer.
+    Holds raw listings by collection, and immutable blobs (post bodies,
+    rendered fragments) by key, bounded in bytes by dropping the oldest.
+    SQLite never runs on the event loop: reads go to a reader thread and
+    give up quickly if the file is busy, writes are queued for a writer
+    thread that commits them in batches. It's only ever a cache -- if
+    SQLite fails, or is busy, we go without it.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        writer = self._connect(WRITE_TIMEOUT)
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.executescript(SCHEMA)
+        self._reader = ThreadPoolExecutor(1, thread_name_prefix="shared-cache-read")
+        self._read_db = self._connect(READ_TIMEOUT)
+
+        # Roughly what's stored, kept by the writer so stats never touch SQLite
+        self.entries = 0
+        self.bytes = 0
+        self._writes: queue.Queue = queue.Queue(MAX_PENDING_WRITES)
+        self._writer = threading.Thread(
+            target=self._write, args=(writer,), name="shared-cache-write", daemon=True
+        )
+        self._writer.start()
+
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def _connect(self, timeout: float) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            self.path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        # A crash can lose the last few writes but never corrupt anything,
+        #  and we don't pay for an fsync per write
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    async def get(self, key: str) -> Optional[bytes]:
+        row = await self._query("SELECT value FROM blobs WHERE key = ?", (key,))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, value: bytes):
+        self._queue(
+            "INSERT OR REPLACE INTO blobs (key, value, size, stored_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time()),
+            len(value),
+        )
+
+    async def listing(self, collection: str) -> Optional[Tuple[str, bytes, float]]:
+        """(version, raw listing, when it was written) for a collection"""
+        row = await self._query(
+            "SELECT version, content, updated_at FROM listings WHERE collection = ?",
+            (collection,),
+        )
+        return (row[0], row[1], row[2]) if row is not None else None
+
+    def put_listing(self, collection: str, version: str, content: bytes):
+        self._queue(
+            "INSERT OR REPLACE INTO listings (collection, version, content, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (collection, version, content, time.time()),
+        )
+
+    async def listing_versions(self) -> Dict[str, str]:
+        def read() -> Dict[str, str]:
+            rows = self._read_db.execute("SELECT collection, version FROM listings")
+            return {collection: version for collection, version in rows}
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._reader, read)
+        except sqlite3.Error as e:
+            self._failed(e)
+            return {}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def close(self):
+        """Commit whatever's queued and stop both threads. Blocks, so run it off the loop"""
+        self._writes.put((_STOP, (), None))
+        self._writer.join()
+        self._reader.shutdown()
+        self._read_db.close()
+
+    async def _query(self, sql: str, params: Tuple) -> Optional[Tuple[Any, ...]]:
+        def read() -> Optional[Tuple[Any, ...]]:
+            return self._read_db.execute(sql, params).fetchone()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._reader, read)
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None
+
+    def _queue(self, sql: str, params: Tuple, size: Optional[int] = None):
+        """Hand a write to the writer, `size` being the blob's if it stores one"""
+        try:
+            self._writes.put_nowait((sql, params, size))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, db: sqlite3.Connection):
+        """The writer thread: commit queued writes a batch at a time"""
+        self._count(db)
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(write[0] is _STOP for write in batch)
+            writes = [write for write in batch if write[0] is not _STOP]
+            try:
+                db.execute("BEGIN")
+                for sql, params, _ in writes:
+                    db.execute(sql, params)
+                db.execute("COMMIT")
+                for _, _, size in writes:
+                    if size is not None:
+                        self.entries += 1
+                        self.bytes += size
+                # Replaced keys are counted twice, so only trust the running
+                #  total to say when to look properly
+                if self.bytes > self.max_bytes:
+                    self._trim(db)
+            except sqlite3.Error as e:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                self._failed(e)
+            if stop:
+                db.close()
+                return
+
+    def _count(self, db: sqlite3.Connection):
+        try:
+            self.entries, self.bytes = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed(e)
+
+    def _trim(self, db: sqlite3.Connection):
+        """Drop the oldest blobs until we're back under `max_bytes`"""
+        self._count(db)
+        if self.bytes <= self.max_bytes:
+            return
+        # Aim a little under so we're not trimming on every batch
+        excess = self.bytes - self.max_bytes * 0.9
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM blobs ORDER BY stored_at"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM blobs WHERE key = ?", doomed)
+        self._count(db)
+
+    def _failed(self, e: sqlite3.Error):
+        self.errors += 1
+        logger.warning(f"shared cache {self.path} failed: {e}")
+
+
+class LeaderLock:
+    """
+    Picks one process on this machine to do work only one should, e.g.
+    polling leaky: whoever holds an exclusive flock on `path`.
+    The lock goes when its holder exits, however it exits, and the next
+    process to try takes over.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[IO] = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """Whether we're the leader, trying to become it if we aren't"""
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        logger.info(f"process {os.getpid()} is now the leader")
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
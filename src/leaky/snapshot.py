@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_snapshot(
+    directory: str,
+    listings: Dict[str, Tuple[str, bytes]],
+    content: Dict[str, bytes],
+) -> Dict[str, Any]:
+    """
+    Write a snapshot of leaky to `directory`.
+    - listings - collection -> (version, raw listing JSON as leaky sent it)
+    - content - CID -> post html
+
+    Blobs are stored once each by hash in a single pack file, which the
+    manifest indexes. The pack is named by its own hash and the manifest is
+    swapped in last, so a reader never sees a half written snapshot.
+    """
+    os.makedirs(directory, exist_ok=True)
+    blobs: Dict[str, List[int]] = {}
+    pack = hashlib.sha256()
+    temp_path = os.path.join(directory, f".pack-{os.getpid()}.tmp")
+    with open(temp_path, "wb") as f:
+
+        def add(data: bytes) -> str:
+            key = blob_hash(data)
+            if key not in blobs:
+                blobs[key] = [f.tell(), len(data)]
+                f.write(data)
+                pack.update(data)
+            return key
+
+        manifest_listings = {
+            collection: {"version": version, "blob": add(data)}
+            for collection, (version, data) in sorted(listings.items())
+        }
+        manifest_content = {cid: add(data) for cid, data in sorted(content.items())}
+
+    pack_name = f"{pack.hexdigest()[:16]}.pack"
+    os.replace(temp_path, os.path.join(directory, pack_name))
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "pack": pack_name,
+        "listings": manifest_listings,
+        "content": manifest_content,
+        "blobs": blobs,
+    }
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(f"{manifest_path}.tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    # Older packs are done with -- anyone still reading one keeps its mapping
+    for name in os.listdir(directory):
+        if name.endswith(".pack") and name != pack_name:
+            os.remove(os.path.join(directory, name))
+    return manifest
+
+
+class Snapshot:
+    """
+    A snapshot written by `write_snapshot`, read through a memory map so
+    opening one costs a manifest parse and blobs are only paged in when read.
+    """
+
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        self.directory = directory
+        self.manifest = manifest
+        self.listings: Dict[str, Dict[str, str]] = manifest["listings"]
+        self.content_blobs: Dict[str, str] = manifest["content"]
+        self.blobs: Dict[str, List[int]] = manifest["blobs"]
+
+        self._file = open(os.path.join(directory, manifest["pack"]), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # Can't map an empty file
+        self._map: Optional[mmap.mmap] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        )
+
+    @classmethod
+    def open(cls, directory: str) -> Optional["Snapshot"]:
+        """The snapshot in `directory`, or None if there isn't a usable one"""
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+            if manifest.get("format") != FORMAT_VERSION:
+                logger.warning(f"ignoring snapshot in {directory}, unknown format")
+                return None
+            return cls(directory, manifest)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"ignoring unreadable snapshot in {directory}: {e}")
+            return None
+
+    def blob(self, key: str) -> Optional[bytes]:
+        location = self.blobs.get(key)
+        if location is None:
+            return None
+        offset, length = location
+        if length == 0:
+            return b""
+        if self._map is None or offset + length > len(self._map):
+            return None
+        return self._map[offset : offset + length]
+
+    def listing(self, collection: str) -> Optional[Tuple[str, bytes]]:
+        """(version, raw listing) for a collection, if the snapshot has it"""
+        entry = self.listings.get(collection)
+        if entry is None:
+            return None
+        data = self.blob(entry["blob"])
+        return (entry["version"], data) if data is not None else None
+
+    def content(self, cid: str) -> Optional[bytes]:
+        key = self.content_blobs.get(cid)
+        return self.blob(key) if key is not None else None
+
+    def verify(self) -> List[str]:
+        """Check every blob against its hash, returning what's wrong"""
+        problems = []
+        for key in self.blobs:
+            data = self.blob(key)
+            if data is None:
+                problems.append(f"blob {key} is outside the pack")
+            elif blob_hash(data) != key:
+                problems.append(f"blob {key} doesn't match its hash")
+        for collection, entry in self.listings.items():
+            if entry["blob"] not in self.blobs:
+                problems.append(f"listing {collection} points at a missing blob")
+        for cid, key in self.content_blobs.items():
+            if key not in self.blobs:
+                problems.append(f"content {cid} points at a missing blob")
+        return problems
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
@@ -0,0 +1,493 @@
+import asyncio
+import logging
+import math
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union, cast
+
+import httpx
+
+from .cache import ContentCache, ListingCache
+from .disk import DiskCache
+from .download import Download
+from .flight import SingleFlight
+from .index import BlogIndex, PathIndex
+from .models import AudioTrack, BlogPost, GalleryImage
+from .shared import SharedCache
+from .snapshot import Snapshot, write_snapshot
+from .utils import decode_json
+
+logger = logging.getLogger(__name__)
+
+# Where each collection is listed on leaky
+COLLECTIONS = {
+    "blog": "/blog?deep=true",
+    "gallery": "/gallery?deep=true",
+    "music": "/music/me",
+}
+
+
+# Collections with secondary indexes get their own kind of PathIndex
+INDEX_TYPES = {
+    "blog": BlogIndex,
+}
+
+# Listings bigger than this (bytes) are decoded and parsed on a worker thread
+#  so a big gallery doesn't stall every other request while it's read
+PARSE_IN_THREAD_BYTES = 256 * 1024
+
+# Called with (collection, old version, new version) when a collection changes
+ChangeListener = Callable[[str, Optional[str], str], None]
+
+
+class LeakyError(Exception):
+    """Raised when leaky returns something we can't use"""
+
+
+class LeakyStore:
+    """Cached access to leaky collections, shared across requests"""
+
+    def __init__(
+        self,
+        base_url: str,
+        client: httpx.AsyncClient,
+        cache: Optional[ListingCache] = None,
+        content: Optional[ContentCache] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        media: Optional[DiskCache] = None,
+        media_urls: Optional[Dict[str, str]] = None,
+        parse_in_thread_bytes: int = PARSE_IN_THREAD_BYTES,
+        shared: Optional[SharedCache] = None,
+        snapshots: bool = False,
+    ):
+        self.base_url = base_url
+        self.client = client
+        self.cache = cache or ListingCache()
+        self.content = content or ContentCache()
+        self.ttls = ttls or {}
+        # On-disk media cache, and where each proxied collection serves from
+        self.media = media
+        self.media_urls = media_urls or {}
+        self.parse_in_thread_bytes = parse_in_thread_bytes
+        # Listings and post bodies other workers have already read
+        self.shared = shared
+        self._downloads: Dict[str, Download] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.flight = SingleFlight()
+
+        # Directory CIDs of the collections we're tracking, see `refresh`
+        self.versions: Dict[str, str] = {}
+        self._listeners: List[ChangeListener] = []
+
+        # What we'd fall back on if leaky went away, see `restore`
+        self.snapshot: Optional[Snapshot] = None
+        # collection -> (version, raw listing) of what we're serving
+        self.listings: Dict[str, Tuple[str, bytes]] = {}
+        # Whether anything has changed since the snapshot was written
+        self.snapshot_dirty = False
+        # Whether snapshots are written at all, and CID -> body of what was
+        #  read without caching since the last one, so it still makes it in
+        self.snapshots = snapshots
+        self.unsaved: Dict[str, str] = {}
+
+    async def fetch_bytes(self, path: str) -> bytes:
+        """GET a path on leaky, raising if it didn't come back 200"""
+        response = await self.client.get(f"{self.base_url}{path}")
+        if response.status_code != 200:
+            raise LeakyError(f"GET {path} returned {response.status_code}")
+        return response.content
+
+    async def fetch_json(self, path: str) -> Any:
+        content = await self.fetch_bytes(path)
+        try:
+            return decode_json(content)
+        except ValueError as e:
+            raise LeakyError(f"GET {path} returned invalid JSON: {e}")
+
+    async def fetch_index(
+        self, collection: str, version: Optional[str] = None
+    ) -> PathIndex:
+        """Read and parse a collection listing, from leaky if no other worker has"""
+        shared = await self._shared_listing(collection, version)
+        if shared is not None:
+            try:
+                return await self.load_index(collection, shared[1], shared[0])
+            except ValueError as e:
+                logger.warning(f"ignoring shared {collection} listing: {e}")
+
+        path = COLLECTIONS[collection]
+        content = await self.fetch_bytes(path)
+        try:
+            index = await self.load_index(collection, content, version)
+        except ValueError as e:
+            raise LeakyError(f"GET {path} returned invalid JSON: {e}")
+        if self.shared is not None:
+            self.shared.put_listing(collection, index.version, content)
+        return index
+
+    async def _shared_listing(
+        self, collection: str, version: Optional[str]
+    ) -> Optional[Tuple[str, bytes]]:
+        """A listing another worker wrote, if it's the version we want or fresh"""
+        if self.shared is None:
+            return None
+        saved = await self.shared.listing(collection)
+        if saved is None:
+            return None
+        saved_version, content, updated_at = saved
+        if version is not None:
+            return (saved_version, content) if saved_version == version else None
+        if time.time() - updated_at < self.ttl(collection):
+            return saved_version, content
+        return None
+
+    async def load_index(
+        self, collection: str, content: bytes, version: Optional[str] = None
+    ) -> PathIndex:
+        """Parse a raw listing, on a worker thread if it's a big one"""
+        if len(content) > self.parse_in_thread_bytes:
+            index = await asyncio.to_thread(
+                self._build_index, collection, content, version
+            )
+        else:
+            index = self._build_index(collection, content, version)
+        # Kept as leaky sent it, for snapshots
+        self.listings[collection] = (index.version, content)
+        self.snapshot_dirty = True
+        return index
+
+    def _build_index(
+        self, collection: str, content: bytes, version: Optional[str]
+    ) -> PathIndex:
+        return self.new_index(
+            collection, self.parse(collection, decode_json(content)), version
+        )
+
+    @staticmethod
+    def new_index(
+        collection: str, entries: List, version: Optional[str] = None
+    ) -> PathIndex:
+        return INDEX_TYPES.get(collection, PathIndex)(entries, version=version)
+
+    async def fetch_text(self, path: str) -> str:
+        response = await self.client.get(f"{self.base_url}{path}")
+        if response.status_code != 200:
+            raise LeakyError(f"GET {path} returned {response.status_code}")
+        return response.text
+
+    async def index(self, collection: str) -> PathIndex:
+        """Read a collection's path index through the listing cache"""
+
+        path = COLLECTIONS[collection]
+
+        async def fetch() -> PathIndex:
+            return await self.fetch_index(collection)
+
+        try:
+            return await self.cache.get(
+                collection,
+                self.ttl(collection),
+                lambda: self.flight.do(path, fetch),
+            )
+        except (LeakyError, httpx.HTTPError) as e:
+            # Nothing cached yet and leaky is unhappy -- render an empty list
+            logger.warning(f"failed to read {collection} listing: {e}")
+            return self.new_index(collection, [])
+
+    def ttl(self, collection: str) -> float:
+        # Collections we track by CID never expire, they're replaced on change
+        if collection in self.versions:
+            return math.inf
+        return self.ttls.get(collection, 60.0)
+
+    async def root_versions(self) -> Dict[str, str]:
+        """Read the CID of each top level directory on leaky"""
+        items = await self.fetch_json("/")
+        return {
+            item["path"].strip("/"): item["cid"]
+            for item in items
+            if isinstance(item, dict) and item.get("is_dir") and item.get("cid")
+        }
+
+    async def refresh(self, collection: str, version: str) -> PathIndex:
+        """Re-read a collection known to be at `version` and swap it in"""
+        path = COLLECTIONS[collection]
+
+        async def fetch() -> PathIndex:
+            return await self.fetch_index(collection, version)
+
+        index = await self.flight.do(f"{path}@{version}", fetch)
+
+        previous = self.versions.get(collection)
+        self.versions[collection] = version
+        self.cache.set(collection, index, math.inf)
+        if previous != version:
+            for listener in self._listeners:
+                listener(collection, previous, version)
+        return index
+
+    def subscribe(self, listener: ChangeListener):
+        """Get told whenever a tracked collection changes version"""
+        self._listeners.append(listener)
+
+    async def version(self, collection: str) -> str:
+        """Content version of a collection -- its directory CID when we know it"""
+        return (await self.index(collection)).version
+
+    def parse(self, collection: str, items: Any) -> List:
+        """Parse a raw collection listing into models, newest first"""
+        if collection == "blog":
+            return BlogPost.from_listing(items)
+        if collection == "gallery":
+            return GalleryImage.from_listing(
+                items, self.base_url, self.media_urls.get("gallery")
+            )
+        if collection == "music":
+            return AudioTrack.from_listing(
+                items, self.base_url, self.media_urls.get("music")
+            )
+        raise ValueError(f"unknown collection {collection}")
+
+    async def blog(self) -> BlogIndex:
+        return cast(BlogIndex, await self.index("blog"))
+
+    async def posts(self, category: Optional[str] = None) -> List[BlogPost]:
+        index = await self.blog()
+        if category:
+            posts = index.category(category)
+            return posts.entries if posts is not None else []
+        return index.entries
+
+    async def post(
+        self, category: str, name: str, upstream: bool = True, cache: bool = True
+    ) -> Optional[BlogPost]:
+        """
+        Read a post with its html content, fetching each version only once.
+        Without `upstream` it's only read from what we (or other workers) have.
+        Without `cache` it's left out of the content cache, for bulk reads
+        (e.g. indexing) that would otherwise push out what's being served.
+        """
+        index = await self.index("blog")
+        post = index.get(f"{category}/{name}")
+        if post is None:
+            return None
+
+        # Bodies are cached by CID, which says nothing about where a post
+        #  lives -- two posts can share one -- so they're always put back onto
+        #  the listing entry for this path
+        if post.cid:
+            body = self.content.get(post.cid) if cache else self.content.peek(post.cid)
+            if body is None:
+                body = await self._stored_body(post.cid, cache)
+            if body is not None:
+                return post.model_copy(update={"content": body})
+
+        if not upstream:
+            return None
+        path = f"/blog/{category}/{name}?html=true"
+
+        async def fetch() -> BlogPost:
+            content = await self.fetch_text(path)
+            if post.cid:
+                self._keep_body(post.cid, content, cache)
+                if self.shared is not None:
+                    self.shared.put(f"post:{post.cid}", content.encode())
+            return post.model_copy(update={"content": content})
+
+        try:
+            # Everyone reading this post right now shares one upstream request
+            return await self.flight.do(path, fetch)
+        except (LeakyError, httpx.HTTPError) as e:
+            logger.warning(f"failed to read post {category}/{name}: {e}")
+            return None
+
+    async def images(self) -> List[GalleryImage]:
+        return (await self.index("gallery")).entries
+
+    async def image(self, category: str, name: str) -> Optional[GalleryImage]:
+        return (await self.index("gallery")).get(f"{category}/{name}")
+
+    async def image_file(
+        self, image: GalleryImage, thumbnail: bool = False
+    ) -> Optional[Path]:
+        """
+        Local copy of an image (or its thumbnail) in the media cache.
+        Downloaded from leaky once per CID, then served from disk.
+        """
+        media = self.media
+        if media is None:
+            return None
+
+        key = f"{image.cid}.thumb" if thumbnail else image.cid
+        cached = media.path(key)
+        if cached is not None:
+            return cached
+
+        path = f"/gallery/{image.name}"
+        params = {"thumbnail": "true"} if thumbnail else None
+
+        async def fetch() -> Path:
+            url = f"{self.base_url}{path}"
+            async with self.client.stream("GET", url, params=params) as response:
+                if response.status_code != 200:
+                    raise LeakyError(f"GET {path} returned {response.status_code}")
+                return await media.write(key, response.aiter_bytes())
+
+        try:
+            return await self.flight.do(f"media:{key}", fetch)
+        except (LeakyError, httpx.HTTPError) as e:
+            logger.warning(f"failed to read media {path}: {e}")
+            return None
+
+    async def tracks(self) -> List[AudioTrack]:
+        return (await self.index("music")).entries
+
+    async def track(self, name: str) -> Optional[AudioTrack]:
+        return (await self.index("music")).get(name)
+
+    async def track_file(self, track: AudioTrack) -> Union[Path, Download, None]:
+        """
+        Local copy of a track in the media cache, or the download filling it.
+        The first listen starts a background download of the whole track that
+        everyone after shares; once it's finished it's served from disk.
+        """
+        media = self.media
+        if media is None or not track.cid:
+            return None
+
+        cached = media.path(track.cid)
+        if cached is not None:
+            return cached
+
+        download = self._downloads.get(track.cid)
+        if download is None:
+            download = Download(media, track.cid)
+            self._downloads[track.cid] = download
+            task = asyncio.create_task(
+                self._download(f"/music/me/{track.name}", download)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        await download.started.wait()
+        if download.error is not None:
+            return None
+        return download
+
+    async def open_track(
+        self, track: AudioTrack, range_header: Optional[str] = None
+    ) -> httpx.Response:
+        """Start streaming a track straight from leaky, the caller closes it"""
+        headers = {"Range": range_header} if range_header else {}
+        request = self.client.build_request(
+            "GET", f"{self.base_url}/music/me/{track.name}", headers=headers
+        )
+        return await self.client.send(request, stream=True)
+
+    async def _download(self, path: str, download: Download):
+        try:
+            async with self.client.stream("GET", f"{self.base_url}{path}") as response:
+                if response.status_code != 200:
+                    raise LeakyError(f"GET {path} returned {response.status_code}")
+                length = response.headers.get("content-length")
+                download.begin(
+                    int(length) if length else None,
+                    response.headers.get("content-type"),
+                )
+                await download.write(response.aiter_bytes())
+        except (LeakyError, httpx.HTTPError, OSError) as e:
+            logger.warning(f"failed to download {path}: {e}")
+            await download.fail(e)
+        finally:
+            self._downloads.pop(download.key, None)
+
+    async def _stored_body(self, cid: str, cache: bool = True) -> Optional[str]:
+        """A post body from another worker or the snapshot"""
+        # Post content never changes for a CID, so theirs is as good as leaky's
+        saved = None
+        in_snapshot = self.snapshot is not None and cid in self.snapshot.content_blobs
+        if self.shared is not None and not in_snapshot:
+            saved = await self.shared.get(f"post:{cid}")
+        if saved is None and self.snapshot is not None:
+            saved = self.snapshot.content(cid)
+        if saved is None:
+            return None
+        body = bytes(saved).decode()
+        self._keep_body(cid, body, cache, new=not in_snapshot)
+        return body
+
+    def _keep_body(self, cid: str, body: str, cache: bool, new: bool = True):
+        """
+        Cache a body we've read, or if it's not to be cached, hold on to it
+        until the next snapshot if it isn't in the last one
+        """
+        if cache:
+            self.content.put(cid, body, len(body.encode()))
+        elif new and self.snapshots:
+            self.unsaved[cid] = body
+        # Only content we didn't already have is worth a new snapshot
+        if new:
+            self.snapshot_dirty = True
+
+    async def restore(self, snapshot: Snapshot, track_versions: bool = False):
+        """
+        Serve collections from a snapshot until leaky has been heard from.
+        With `track_versions` the refresher takes it from here and only
+        re-reads what changed, otherwise they're refetched on first use.
+        """
+        self.snapshot = snapshot
+        for collection in COLLECTIONS:
+            saved = snapshot.listing(collection)
+            if saved is None or self.cache.peek(collection) is not None:
+                continue
+            version, content = saved
+            try:
+                index = await self.load_index(collection, bytes(content), version)
+            except ValueError as e:
+                logger.warning(f"failed to restore {collection} from snapshot: {e}")
+                continue
+            if track_versions:
+                self.versions[collection] = version
+                self.cache.set(collection, index, math.inf)
+            else:
+                # Already stale, the first read refreshes it in the background
+                self.cache.set(collection, index, 0)
+        # Nothing new yet
+        self.snapshot_dirty = False
+
+    async def save_snapshot(self, directory: str):
+        """Write what we're serving to `directory`, for the next startup"""
+        content: Dict[str, bytes] = {}
+        index = self.cache.peek("blog")
+        for post in index.entries if index is not None else []:
+            if not post.cid:
+                continue
+            cached = self.content.peek(post.cid) or self.unsaved.get(post.cid)
+            if cached is not None:
+                content[post.cid] = cached.encode()
+            elif self.snapshot is not None:
+                saved = self.snapshot.content(post.cid)
+                if saved is not None:
+                    content[post.cid] = bytes(saved)
+
+        self.snapshot_dirty = False
+        await asyncio.to_thread(write_snapshot, directory, dict(self.listings), content)
+        # Anything read while that was written waits for the next one
+        self.unsaved = {
+            cid: body for cid, body in self.unsaved.items() if cid not in content
+        }
+        # Read from the new one from now on
+        snapshot = Snapshot.open(directory)
+        if snapshot is not None:
+            if self.snapshot is not None:
+                self.snapshot.close()
+            self.snapshot = snapshot
+
+    async def close(self):
+        await self.cache.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
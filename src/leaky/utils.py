@@ -1,15 +1,36 @@
-from datetime import datetime
-from typing import Optional, Any
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Any, Optional
+
+import msgspec
+
+
+def decode_json(content: bytes) -> Any:
+    """Decode a JSON response body, raising ValueError if it isn't JSON"""
+    # msgspec decodes a good deal faster than the standard library
+    try:
+        return msgspec.json.decode(content)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+@lru_cache(maxsize=65536)
+def _leaky_datetime(
+    year: int, ordinal: int, hour: int, minute: int, second: int, nanosecond: int
+) -> datetime:
+    day = date.fromordinal(date(year, 1, 1).toordinal() + ordinal - 1)
+    if day.year != year:
+        raise ValueError(f"day {ordinal} is not in {year}")
+    return datetime.combine(day, time(hour, minute, second, nanosecond // 1000))
 
 
 def parse_date(date_value: Any) -> Optional[datetime]:
     if isinstance(date_value, list) and len(date_value) >= 9:
         try:
-            # New format has [year, month, day, hour, minute, second, microsecond, _, _]
-            return datetime.strptime(
-                f"{date_value[0]} {date_value[1]}",
-                "%Y %j",
-            )
-        except (ValueError, IndexError):
+            # New format has [year, ordinal day, hour, minute, second, nanosecond,
+            #  offset hours, minutes, seconds]. The same timestamps come back on
+            #  every refresh, so they're cached
+            return _leaky_datetime(*date_value[:6])
+        except (ValueError, TypeError, OverflowError):
             return None
     return None
@@ -1,47 +1,124 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from fastapi import Request
-from typing import Optional
+from typing import Any, Optional
 
 
-# Used to log events that span a request on our server
-class RequestFormatter(logging.Formatter):
-    def format(self, record):
-        if hasattr(record, "method"):
-            record.method = record.method
-        # Note: this should never happen, but if it does, we'll just set the request method and URL to N/A
+@dataclass
+class RequestContext:
+    method: str
+    url: str
+    request_id: str
+    started: float = field(default_factory=time.perf_counter)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+# The request being handled by the current task, if any
+request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request's context as they're logged"""
+
+    def filter(self, record):
+        context = request_context.get()
+        if context is not None:
+            record.method = context.method
+            record.url = context.url
+            record.request_id = context.request_id
+            record.elapsed_ms = round(context.elapsed_ms(), 2)
         else:
+            # Logged outside of a request, e.g. at startup or from a background task
             record.method = "N/A"
-        if hasattr(record, "url"):
-            record.url = record.url
-        # Note: this should never happen, but if it does, we'll just set the request method and URL to N/A
-        else:
             record.url = "N/A"
-        return super().format(record)
+            record.request_id = "-"
+            record.elapsed_ms = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+            entry["method"] = record.method
+            entry["url"] = record.url
+            entry["elapsed_ms"] = record.elapsed_ms
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Already formatted by LogQueueHandler before it crossed threads
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Request ids we'll take from a client or proxy instead of making our own
+REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread. Only the message is rendered here
+    (its args might not be safe to touch from another thread), the listener's
+    handler does the real formatting off the loop.
+    """
+
+    def prepare(self, record):
+        # Records only ever go to this one handler, so skip the copy
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exc_formatter = logging.Formatter()
+
+
+TEXT_FORMAT = (
+    "%(asctime)s - %(name)s - %(levelname)s - %(request_id)s %(method)s %(url)s"
+    " - %(message)s"
+)
 
 
 class Logger:
     logger: logging.Logger
     handler: logging.Handler
+    listener: logging.handlers.QueueListener
 
-    def __init__(self, log_path=None, debug=False):
+    def __init__(self, log_path=None, debug=False, json_output=False):
         """
         Initialize a new Log instance
         - log_path - where to send output. If `None` logs are sent to the console
         - debug - whether to set debug level
-        """
+        - json_output - whether to write JSON lines instead of text
 
-        # Create the logger
-        logger = logging.getLogger(__name__)
-
-        # Set our debug mode
-        if debug:
-            logging.basicConfig(level=logging.DEBUG)
-            # Hide debug logs from other libraries
-            logging.getLogger("asyncio").setLevel(logging.WARNING)
-            logging.getLogger("aiosqlite").setLevel(logging.WARNING)
-        else:
-            logging.basicConfig(level=logging.INFO)
+        Records are stamped with the request context and queued where they're
+        logged, then formatted and written by a background thread, so nothing
+        on the event loop waits on log I/O.
+        """
 
         # Set where to send logs
         if log_path is not None and log_path.strip() != "":
@@ -52,53 +129,87 @@ class Logger:
             self.handler = logging.FileHandler(log_path)
         else:
             self.handler = logging.StreamHandler()
+        self.handler.setFormatter(
+            JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT)
+        )
 
-        if logger.hasHandlers():
-            logger.handlers.clear()
-        logger.addHandler(self.handler)
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = LogQueueHandler(log_queue)
+        queue_handler.addFilter(RequestContextFilter())
+        self.listener = logging.handlers.QueueListener(
+            log_queue, self.handler, respect_handler_level=True
+        )
 
-        self.logger = logger
+        # Everything goes through the queue, replacing any earlier setup
+        logging.basicConfig(
+            level=logging.DEBUG if debug else logging.INFO,
+            handlers=[queue_handler],
+            force=True,
+        )
+        if debug:
+            # Hide debug logs from other libraries
+            logging.getLogger("asyncio").setLevel(logging.WARNING)
+            logging.getLogger("aiosqlite").setLevel(logging.WARNING)
+
+        self.listener.start()
+        self._running = True
+        # Don't lose whatever is still queued when the process exits
+        atexit.register(self.stop)
+        self.logger = logging.getLogger(__name__)
+
+    def stop(self):
+        """Flush anything still queued and stop the writer thread"""
+        if self._running:
+            self._running = False
+            self.listener.stop()
 
-    # TODO: be better about this
     def get_worker_logger(
         self, name: Optional[str] = None, attempt: Optional[int] = None
     ):
-        formatter = logging.Formatter(
-            f"[worker] %(asctime)s - {name} - {attempt} - %(levelname)s - %(message)s"
-        )
-        self.handler.setFormatter(formatter)
-        return self.logger
+        return WorkerLogger(self.logger, {"worker": name, "attempt": attempt})
 
     def get_request_span(self, request: Request):
-        # Set the log formatter
-        formatter = RequestFormatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(method)s - %(url)s"
+        """Start a span for `request`, making it the current request context"""
+        request_id = request.headers.get("x-request-id", "")
+        if not REQUEST_ID.match(request_id):
+            request_id = secrets.token_hex(8)
+        context = RequestContext(
+            method=request.method, url=str(request.url), request_id=request_id
+        )
+        request_context.set(context)
+        return RequestSpan(self.logger, request, context)
+
+
+class WorkerLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        extra = self.extra or {}
+        return (
+            f"[worker] {extra.get('worker')} - {extra.get('attempt')} - {msg}",
+            kwargs,
         )
-        self.handler.setFormatter(formatter)
-        return RequestSpan(self.logger, request)
 
 
 class RequestSpan:
-    def __init__(self, logger, request: Request):
+    def __init__(self, logger, request: Request, context: RequestContext):
         self.logger = logger
         self.request = request
+        self.context = context
+
+    @property
+    def request_id(self) -> str:
+        return self.context.request_id
+
+    def elapsed_ms(self) -> float:
+        return self.context.elapsed_ms()
 
     def warn(self, message):
-        self.logger.warn(
-            message, extra={"method": self.request.method, "url": self.request.url}
-        )
+        self.logger.warning(message)
 
     def debug(self, message):
-        self.logger.debug(
-            message, extra={"method": self.request.method, "url": self.request.url}
-        )
+        self.logger.debug(message)
 
     def info(self, message):
-        self.logger.info(
-            message, extra={"method": self.request.method, "url": self.request.url}
-        )
+        self.logger.info(message)
 
     def error(self, message):
-        self.logger.error(
-            message, extra={"method": self.request.method, "url": self.request.url}
-        )
+        self.logger.error(message)
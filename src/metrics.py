@@ -0,0 +1,343 @@
+"""
+Prometheus-style metrics, rendered in the text exposition format.
+
+Everything is recorded from the event loop thread, so instruments are plain
+counters in dicts -- no locks. Label values are looked up once per request
+and known ones can be created up front with `labels()`.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds, roughly doubling from 5ms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes, from 1KB up to 10MB
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 1e7)
+# How late a scheduled wakeup of the loop ran
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# (name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str):
+        """The instrument for one set of label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children[values] = self._child()
+        return child
+
+    def _child(self) -> Any:
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+    def _label_dict(self, values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield self.name, self._label_dict(values), child.value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One more for +Inf, cumulated when rendered rather than recorded
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            labels = self._label_dict(values)
+            total = 0
+            for bound, count in zip((*self.buckets, math.inf), child.counts):
+                total += count
+                yield f"{self.name}_bucket", {
+                    **labels,
+                    "le": _format_value(bound),
+                }, total
+            yield f"{self.name}_count", labels, total
+            yield f"{self.name}_sum", labels, child.sum
+
+
+# Called at scrape time for metrics that live elsewhere, e.g. cache stats
+Collector = Callable[[], Iterable[Metric]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Collector] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.register(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, help, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.register(metric)
+        return metric
+
+    def add_collector(self, collector: Collector):
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector: Collector):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                for metric in collector():
+                    lines.extend(metric.render())
+            except Exception as e:
+                # A broken collector shouldn't take the rest down with it
+                logger.warning(f"metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+# Requests, labelled by route template rather than path to keep the series bounded
+request_duration = registry.histogram(
+    "ondo_request_duration_seconds",
+    "Time to handle a request, until the last byte is sent",
+    ("method", "route", "status"),
+)
+requests_in_flight = registry.gauge(
+    "ondo_requests_in_flight", "Requests currently being handled"
+)
+response_size = registry.histogram(
+    "ondo_response_size_bytes",
+    "Response body size as sent, after compression",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+
+# Calls to leaky
+upstream_duration = registry.histogram(
+    "ondo_leaky_request_duration_seconds",
+    "Time until leaky responded with headers",
+    ("collection", "status"),
+)
+upstream_errors = registry.counter(
+    "ondo_leaky_request_errors_total",
+    "Requests to leaky that failed without a response",
+    ("collection",),
+)
+
+loop_lag = registry.histogram(
+    "ondo_event_loop_lag_seconds",
+    "How late the event loop ran a scheduled callback",
+    buckets=LAG_BUCKETS,
+)
+
+
+def leaky_collection(path: str) -> str:
+    """The collection a leaky path belongs to, e.g. `/blog/a/b.md` -> `blog`"""
+    first = path.lstrip("/").split("/", 1)[0]
+    return first if first in ("blog", "gallery", "music") else "root"
+
+
+def observe_leaky(request: httpx.Request, status: Optional[int], seconds: float):
+    """Record a call to leaky, for `create_client(observer=...)`"""
+    collection = leaky_collection(request.url.path)
+    if status is None:
+        upstream_errors.labels(collection).inc()
+    else:
+        upstream_duration.labels(collection, str(status)).observe(seconds)
+
+
+# Cache stats that only ever go up, everything else is reported as a gauge
+CACHE_COUNTERS = {
+    "hits",
+    "stale_hits",
+    "misses",
+    "evictions",
+    "refresh_errors",
+    "dropped",
+    "errors",
+}
+
+
+def cache_metrics(caches: Dict[str, Dict[str, int]]) -> List[Metric]:
+    """
+    Turn `stats()` from our caches into metrics, e.g. `{"listings": {"hits": 3}}`
+    becomes `ondo_cache_hits_total{cache="listings"} 3`
+    """
+    metrics: Dict[str, Metric] = {}
+    for cache, stats in caches.items():
+        for stat, value in stats.items():
+            if stat in CACHE_COUNTERS:
+                name = f"ondo_cache_{stat}_total"
+                metric = metrics.get(name) or Counter(name, f"Cache {stat}", ("cache",))
+            else:
+                name = f"ondo_cache_{stat}"
+                metric = metrics.get(name) or Gauge(name, f"Cache {stat}", ("cache",))
+            metrics[name] = metric
+            metric.labels(cache).set(value)
+    return list(metrics.values())
+
+
+class LoopLagMonitor:
+    """
+    Sleeps for `interval` over and over and records how much longer than that
+    it actually took, which is time the loop spent busy with something else.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        lag = loop_lag.labels()
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag.observe(max(0.0, time.perf_counter() - started - self.interval))
@@ -1,41 +1,47 @@
 from fastapi import FastAPI, Request, APIRouter
+from fastapi.routing import APIRoute
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException
 from contextlib import asynccontextmanager
 import asyncio
+import logging
 from pathlib import Path
 
-from fastapi.staticfiles import StaticFiles
 from sse_starlette.sse import EventSourceResponse
 from watchfiles import awatch
+from src import metrics
+from src.compression import CompressionMiddleware
 from src.state import AppState
 from .pages import router as pages_router
 from .api import router as api_router
 from .health import router as health_router
 from .status import router as status_router
 from .handlers import PageResponse
+from .middleware import MetricsMiddleware, SpanMiddleware, StateMiddleware
+from .handlers.static import assets, configure_static
+from .handlers.caching import templates_version
+from .handlers.templates import configure_templates, precompile_templates
+
+logger = logging.getLogger(__name__)
 
 
 def create_app(state: AppState) -> FastAPI:
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         await state.startup()
+        # Compile templates now rather than on the first request for each
+        configure_templates(
+            state.config.dev_mode,
+            state.config.template_cache_dir,
+            state.config.prefetch_count,
+        )
+        precompile_templates()
+        if state.fragments is not None:
+            state.fragments.namespace = templates_version()
+        configure_static(state.config.dev_mode, state.config.static_build_dir)
         yield
         await state.shutdown()
 
-    async def state_middleware(request: Request, call_next):
-        request.state.app_state = state
-        return await call_next(request)
-
-    async def span_middleware(request: Request, call_next):
-        request.state.span = state.logger.get_request_span(request)
-        try:
-            response = await call_next(request)
-            return response
-        except Exception as e:
-            request.state.span.error(str(e))
-            raise
-
     app = FastAPI(lifespan=lifespan)
 
     # Add exception handlers
@@ -47,11 +53,15 @@ def create_app(state: AppState) -> FastAPI:
                 content={"error": exc.detail},
             )
 
-        print(f"HTTPException: {exc.status_code} {exc.detail}")
+        logger.debug(f"HTTPException: {exc.status_code} {exc.detail}")
         # For HTML requests, render the 404 page
         if exc.status_code == 404:
-            print("404")
-            page = PageResponse("pages/404.html", layout="layouts/app.html")
+            page = PageResponse(
+                "pages/404.html",
+                layout="layouts/app.html",
+                cache_control="no-store",
+                etag=False,
+            )
             return page.render(request, {})
 
         # For other errors, still return JSON
@@ -61,8 +71,11 @@ def create_app(state: AppState) -> FastAPI:
         )
 
     # Add middleware
-    app.middleware("http")(state_middleware)
-    app.middleware("http")(span_middleware)
+    app.add_middleware(StateMiddleware, state=state)
+    app.add_middleware(SpanMiddleware, state=state)
+    app.add_middleware(CompressionMiddleware)
+    # Outermost, so it sees every response as it goes out
+    app.add_middleware(MetricsMiddleware)
 
     # Hot reloading for development
     if state.config.dev_mode:
@@ -94,8 +107,13 @@ def create_app(state: AppState) -> FastAPI:
 
         app.include_router(dev_router)
 
-    # Mount static files
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    # Static files, fingerprinted and precompressed when there's a build
+    app.add_api_route(
+        "/static/{path:path}",
+        assets.serve,
+        methods=["GET", "HEAD"],
+        include_in_schema=False,
+    )
 
     # Include routers
     app.include_router(pages_router)
@@ -108,6 +126,13 @@ def create_app(state: AppState) -> FastAPI:
     async def up():
         return "OK"
 
+    # Create each route's series up front, so they're there from the first scrape
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            for method in route.methods:
+                metrics.request_duration.labels(method, route.path, "200")
+                metrics.response_size.labels(method, route.path)
+
     return app
 
 
@@ -1,5 +1,10 @@
-from fastapi import Request
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
 
+import httpx
+from fastapi import HTTPException, Query, Request
+
+from src.leaky import InvalidCursor, LeakyStore, Page, PostSearch, Prefetcher, paginate
 from src.logger import RequestSpan
 
 
@@ -13,3 +18,63 @@ def state(request: Request):
 
 def leaky_url(request: Request) -> str:
     return request.state.app_state.config.leaky_url
+
+
+def leaky_client(request: Request) -> Optional[httpx.AsyncClient]:
+    return request.state.app_state.leaky_client
+
+
+def leaky(request: Request) -> LeakyStore:
+    return request.state.app_state.leaky
+
+
+def post_search(request: Request) -> PostSearch:
+    return request.state.app_state.search
+
+
+def prefetcher(request: Request) -> Optional[Prefetcher]:
+    return request.state.app_state.prefetcher
+
+
+# Most items a client can ask for in one page
+MAX_PAGE_SIZE = 200
+
+
+class Paging:
+    """
+    `limit` and `cursor` query params for the list endpoints.
+    `limit` is between 1 and MAX_PAGE_SIZE, clients can't turn paging off --
+    only PAGE_SIZE=0 does that, for every list.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+    ):
+        if limit is None:
+            limit = request.state.app_state.config.page_size
+        self.limit = limit
+        self.cursor = cursor
+        self.path = request.url.path
+
+    def params(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """What a page depends on, for the response cache"""
+        return {"cursor": self.cursor, "limit": self.limit if limit is None else limit}
+
+    def page(self, entries: List, limit: Optional[int] = None) -> Page:
+        """The requested page of `entries`, optionally overriding its size"""
+        try:
+            return paginate(
+                entries, self.cursor, self.limit if limit is None else limit
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def next_url(self, page: Page) -> Optional[str]:
+        """Where to fetch the page after `page`, if there is one"""
+        if page.next_cursor is None:
+            return None
+        query = urlencode({"cursor": page.next_cursor, "limit": self.limit})
+        return f"{self.path}?{query}"
@@ -0,0 +1,67 @@
+import hashlib
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .static import assets
+from .templates import TEMPLATE_DIR
+
+# Both handlers serve different content at the same url depending on these
+VARY = "HX-Request, Accept"
+
+
+@lru_cache(maxsize=1)
+def templates_version() -> str:
+    """Digest of every template source, so a deploy that changes them busts etags"""
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(TEMPLATE_DIR)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(path.encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def make_etag(*parts: str) -> str:
+    """Strong etag over the things that determine a response body"""
+    digest = hashlib.sha1(
+        "\x00".join((templates_version(), assets.version, *parts)).encode()
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+def etags_enabled(request: Request) -> bool:
+    # Templates change underneath us in dev, don't let browsers hold on to them
+    app_state = getattr(request.state, "app_state", None)
+    return not (app_state is not None and app_state.config.dev_mode)
+
+
+def fragments_enabled(request: Request) -> bool:
+    # Fragment keys don't cover template source and dev reloads don't watch
+    #  templates, so cached html would hide template edits
+    return etags_enabled(request)
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already covers `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cache_headers(etag: Optional[str], cache_control: str) -> Dict[str, str]:
+    headers = {"Cache-Control": cache_control, "Vary": VARY}
+    if etag is not None:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
@@ -1,40 +1,136 @@
+from urllib.parse import urlencode
+
 from fastapi import Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import Any, Dict
-
+from typing import Any, Dict, Optional
 
-templates = Jinja2Templates(directory="templates")
+from src.fragments import FragmentCache, FragmentKey
+from .templates import templates
+from .caching import (
+    cache_headers,
+    etags_enabled,
+    fragments_enabled,
+    is_not_modified,
+    make_etag,
+    not_modified,
+)
 
 
 class ComponentResponseHandler:
     """Handler that returns JSON or HTML components (never full pages)"""
 
-    def __init__(self, component_template_path: str):
+    def __init__(
+        self,
+        component_template_path: str,
+        cache: bool = False,
+        cache_control: str = "no-cache",
+    ):
+        """
+        - component_template_path - the template to render for htmx requests
+        - cache - whether to cache rendered html by content version (opt-in)
+        - cache_control - the Cache-Control policy for this route
+        """
         self.component_template_path = component_template_path
+        self.cache = cache
+        self.cache_control = cache_control
 
     async def respond(
-        self, request: Request, data: BaseModel | Dict[str, Any]
-    ) -> HTMLResponse | JSONResponse:
-        """Return JSON or HTML component based on Accept header"""
+        self,
+        request: Request,
+        data: BaseModel | Dict[str, Any],
+        version: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Response:
+        """
+        Return JSON or HTML component based on Accept header.
+        If a content `version` is given the response gets an etag, and when
+        caching is on html is rendered once per version and served straight
+        from the fragment cache after that. `params` are the query params
+        the route read, anything else in the query string is ignored.
+        """
+
+        # Check what type of response to return
+        hx_request = request.headers.get("HX-Request", "")
+        variant = self._variant(request, params)
+
+        # Conditional requests for a version the client has get a 304
+        etag = self._etag(request, version, variant)
+        if etag is not None and is_not_modified(request, etag):
+            return not_modified(etag, self.cache_control)
+        headers = cache_headers(etag, self.cache_control)
+
+        fragments = self._fragments(request) if hx_request and version else None
+        key: FragmentKey = (self.component_template_path, version or "", variant)
+        if fragments is not None:
+            body = await fragments.load_fragment(key)
+            if body is not None:
+                return fragments.respond(request, key, body, headers)
 
         # Convert BaseModel to dict if needed
         if isinstance(data, BaseModel):
             response_data = data.model_dump()
         else:
-
-            print(f"data: {data}")
             response_data = data
 
-        # Check what type of response to return
-        hx_request = request.headers.get("HX-Request", "")
-
         # JSON response for API calls
         if not hx_request:
-            print(f"returning json response: {response_data}")
-            return JSONResponse(content=response_data)
+            # Contexts hold models and datetimes, which json can't take as is
+            return JSONResponse(
+                content=jsonable_encoder(response_data), headers=headers
+            )
 
         # Always return component for HTML (never full page)
         template_data = {"request": request, **response_data}
-        return templates.TemplateResponse(self.component_template_path, template_data)
+        if fragments is None:
+            return templates.TemplateResponse(
+                self.component_template_path, template_data, headers=headers
+            )
+
+        template = templates.get_template(self.component_template_path)
+        body = template.render(template_data).encode()
+        fragments.share_fragment(key, body)
+        return fragments.respond(request, key, body, headers)
+
+    def not_modified(
+        self,
+        request: Request,
+        version: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Response]:
+        """
+        The 304 `respond` would give for `version`, if the client already has
+        it, so routes can answer before loading anything to render
+        """
+        etag = self._etag(request, version, self._variant(request, params))
+        if etag is not None and is_not_modified(request, etag):
+            return not_modified(etag, self.cache_control)
+        return None
+
+    def _etag(
+        self, request: Request, version: Optional[str], variant: str
+    ) -> Optional[str]:
+        if not version or not etags_enabled(request):
+            return None
+        return make_etag(
+            self.component_template_path,
+            version,
+            variant,
+            "html" if request.headers.get("HX-Request", "") else "json",
+        )
+
+    def _fragments(self, request: Request) -> Optional[FragmentCache]:
+        if not self.cache or not fragments_enabled(request):
+            return None
+        return getattr(request.state.app_state, "fragments", None)
+
+    def _variant(self, request: Request, params: Optional[Dict[str, Any]]) -> str:
+        # The path and the params the route read are all that change what a
+        #  component renders for a version. Versions are CIDs, and two paths
+        #  can share one, so the path has to be part of it. Params the route
+        #  never looks at would only split the cache
+        query = urlencode(
+            sorted((k, v) for k, v in (params or {}).items() if v is not None)
+        )
+        return f"{request.url.path}?{query}"
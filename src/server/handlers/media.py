@@ -0,0 +1,56 @@
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .caching import is_not_modified
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range doesn't overlap the file"""
+
+
+def media_headers(etag: str, version: Optional[str], cid: str) -> Dict[str, str]:
+    """Headers for proxied media -- urls pinned to the current CID never change"""
+    cache_control = IMMUTABLE if version == cid else "public, max-age=60"
+    return {"Cache-Control": cache_control, "ETag": etag, "Accept-Ranges": "bytes"}
+
+
+def not_modified_media(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    # The CID is the content, so a matching etag doesn't need the file at all
+    if is_not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+    Returns None when the whole file should be sent (no header, or one we
+    don't handle like multiple ranges).
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes=") :].strip()
+    if "," in spec:
+        return None
+
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if not start_text:
+            # Suffix range, the last n bytes
+            length = int(end_text)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - length, 0), size - 1
+
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
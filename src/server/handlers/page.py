@@ -1,33 +1,171 @@
 from datetime import datetime
 from fastapi import Request
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from typing import Dict, Any
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, Optional
 
-templates = Jinja2Templates(directory="templates")
+from src.fragments import FragmentCache, FragmentKey
+from .templates import templates
+from .caching import (
+    cache_headers,
+    etags_enabled,
+    fragments_enabled,
+    is_not_modified,
+    make_etag,
+    not_modified,
+)
+
+# Roughly how much rendered html to collect before sending it on
+STREAM_BATCH_SIZE = 8 * 1024
+
+# Send everything up to here as soon as it's rendered, so the browser can
+#  start on css and scripts while we render the rest
+STREAM_FLUSH_AFTER = "</head>"
+
+
+def batched(
+    chunks: Iterable[str], flush_after: str = STREAM_FLUSH_AFTER
+) -> Iterator[str]:
+    """
+    Group the tiny strings Jinja generates into batches worth a network write,
+    flushing early once `flush_after` has been rendered.
+    """
+    buffer: list[str] = []
+    size = 0
+    flushed = False
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_BATCH_SIZE or (not flushed and flush_after in chunk):
+            flushed = True
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
 
 
 class PageResponse:
     """Helper for HTMX-aware page responses"""
 
-    def __init__(self, template: str, layout: str = "layouts/app.html"):
+    def __init__(
+        self,
+        template: str,
+        layout: str = "layouts/app.html",
+        cache_control: str = "no-cache",
+        etag: bool = True,
+        stream: bool = True,
+        cache: bool = True,
+    ):
+        """
+        - template - the page content, rendered alone for htmx navigation
+        - layout - wraps the content on full page loads
+        - cache_control - the Cache-Control policy for this page
+        - etag - whether to send (and honour) etags
+        - stream - whether to stream full pages as they render
+        - cache - whether to cache whole pages under their etag, off for pages
+          taking route params, which anyone can make up
+
+        Pages with an etag are also cached whole (and compressed) under it,
+        unless `cache` is off.
+        """
         self.template = template
         self.layout = layout
+        self.cache_control = cache_control
+        self.etag = etag
+        self.stream = stream
+        self.cache = cache
 
-    def render(self, request: Request, data: Dict[str, Any]) -> HTMLResponse:
+    def render(self, request: Request, data: Dict[str, Any]) -> Response:
         template_data = {
             "request": request,
             "current_year": datetime.now().year,
             **data,
         }
+        hx_request = bool(request.headers.get("HX-Request"))
+
+        # Pages are shells around htmx components, so the templates and the
+        #  route data are all that decide what we send
+        etag = None
+        if self.etag and etags_enabled(request):
+            etag = make_etag(
+                self.template,
+                self.layout if not hx_request else "",
+                repr(
+                    sorted((k, v) for k, v in template_data.items() if k != "request")
+                ),
+            )
+            if is_not_modified(request, etag):
+                return not_modified(etag, self.cache_control)
+        headers = cache_headers(etag, self.cache_control)
+
+        # The etag covers everything that goes into the page, so it makes a
+        #  good cache key too
+        fragments = self._fragments(request) if etag is not None else None
+        key: FragmentKey = (
+            self.template,
+            etag or "",
+            "hx" if hx_request else self.layout,
+        )
+        if fragments is not None:
+            body = fragments.get_fragment(key)
+            if body is not None:
+                return fragments.respond(request, key, body, headers)
+
+        content_template = templates.get_template(self.template)
 
         # HTMX navigation - return just the content
-        if request.headers.get("HX-Request"):
-            return templates.TemplateResponse(self.template, template_data)
+        if hx_request:
+            if fragments is None:
+                return templates.TemplateResponse(
+                    self.template, template_data, headers=headers
+                )
+            body = content_template.render(template_data).encode()
+            fragments.put_fragment(key, body)
+            return fragments.respond(request, key, body, headers)
+
+        # Full page - stream the layout, rendering the content into it as we go
+        if self.stream:
+            template_data["content_stream"] = content_template.generate(template_data)
+            layout_template = templates.get_template(self.layout)
+            return StreamingResponse(
+                self._cache_stream(
+                    batched(layout_template.generate(template_data)), fragments, key
+                ),
+                media_type="text/html",
+                headers=headers,
+            )
 
         # Full page - render content then wrap in layout
-        content_template = templates.get_template(self.template)
         content_html = content_template.render(template_data)
 
         template_data["content"] = content_html
-        return templates.TemplateResponse(self.layout, template_data)
+        if fragments is None:
+            return templates.TemplateResponse(
+                self.layout, template_data, headers=headers
+            )
+        body = templates.get_template(self.layout).render(template_data).encode()
+        fragments.put_fragment(key, body)
+        return fragments.respond(request, key, body, headers)
+
+    async def _cache_stream(
+        self,
+        chunks: Iterator[str],
+        fragments: Optional[FragmentCache],
+        key: FragmentKey,
+    ) -> AsyncIterator[bytes]:
+        """Send chunks as they render, caching the whole page once it's done"""
+        parts = []
+        # Render in the threadpool, but touch the cache from the event loop
+        async for chunk in iterate_in_threadpool(chunks):
+            data = chunk.encode()
+            parts.append(data)
+            yield data
+        if fragments is not None:
+            fragments.put_fragment(key, b"".join(parts))
+
+    def _fragments(self, request: Request) -> Optional[FragmentCache]:
+        if not self.cache or not fragments_enabled(request):
+            return None
+        app_state = getattr(request.state, "app_state", None)
+        return getattr(app_state, "fragments", None)
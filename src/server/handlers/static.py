@@ -0,0 +1,103 @@
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+from src.assets import load_manifest
+from src.compression import accepted_encodings
+from .templates import templates
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class StaticAssets:
+    """
+    Serves `/static`. Files from a `python -m src.assets` build go out under
+    their hashed names with immutable caching, precompressed when the client
+    accepts it. Everything else comes straight from the source directory.
+    """
+
+    def __init__(self, source_dir: str = "static"):
+        self.source = StaticFiles(directory=source_dir, check_dir=False)
+        self.build_dir: Optional[str] = None
+        # original path -> hashed path
+        self.urls: Dict[str, str] = {}
+        # hashed path -> encodings we have precompressed
+        self.built: Dict[str, List[str]] = {}
+        self.version = ""
+
+    def load(self, build_dir: str) -> bool:
+        """Serve from a build, returning whether there was one"""
+        manifest = load_manifest(build_dir)
+        if manifest is None:
+            return False
+
+        files = manifest["files"]
+        self.build_dir = build_dir
+        self.urls = {path: entry["path"] for path, entry in files.items()}
+        self.built = {entry["path"]: entry["encodings"] for entry in files.values()}
+        # Pages link to hashed names, so their etags need to change with them
+        self.version = hashlib.sha1(
+            json.dumps(self.urls, sort_keys=True).encode()
+        ).hexdigest()
+        return True
+
+    def url(self, path: str) -> str:
+        """Public url for a static file, hashed when we have a build of it"""
+        path = path.lstrip("/")
+        return f"/static/{self.urls.get(path, path)}"
+
+    async def serve(self, request: Request, path: str) -> Response:
+        encodings = self.built.get(path)
+        if self.build_dir is None or encodings is None:
+            return await self.source.get_response(path, request.scope)
+
+        full_path, encoding = self._variant(
+            path, encodings, request.headers.get("accept-encoding", "")
+        )
+        headers = {
+            "Cache-Control": IMMUTABLE,
+            # The hash in the name is the content
+            "ETag": f'"{path}-{encoding or "identity"}"',
+        }
+        if encodings:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return FileResponse(full_path, media_type=media_type, headers=headers)
+
+    def _variant(
+        self, path: str, encodings: List[str], accept_encoding: str
+    ) -> Tuple[str, Optional[str]]:
+        full_path = os.path.join(self.build_dir or "", path)
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings and encoding in accepted:
+                return f"{full_path}{suffix}", encoding
+        return full_path, None
+
+
+assets = StaticAssets()
+
+# Templates link static files through this, e.g. `static_url('css/main.css')`
+templates.env.globals["static_url"] = assets.url
+
+
+def configure_static(dev_mode: bool, build_dir: str) -> bool:
+    """
+    Serve the built assets, if there are any. Dev always serves the source
+    files so tailwind --watch output shows up straight away.
+    """
+    if dev_mode:
+        return False
+    return assets.load(build_dir)
@@ -0,0 +1,57 @@
+import logging
+import os
+import time
+from typing import Dict
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = "templates"
+
+# The one template environment every handler renders with
+templates = Jinja2Templates(directory=TEMPLATE_DIR)
+
+# Set while rendering a static export, see `src.export`
+templates.env.globals["static_site"] = False
+# How many entries at the top of a list get prefetch hints, see `configure_templates`
+templates.env.globals["prefetch_count"] = 0
+
+# How many of the slowest templates to call out in the startup report
+SLOWEST_REPORTED = 5
+
+
+def configure_templates(dev_mode: bool, cache_dir: str, prefetch_count: int = 0):
+    """
+    Set up the shared environment for this process -- only check templates
+    for changes in dev, and keep compiled bytecode on disk so new workers
+    don't have to compile anything.
+    """
+    env = templates.env
+    env.auto_reload = dev_mode
+    env.globals["prefetch_count"] = prefetch_count
+    os.makedirs(cache_dir, exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def precompile_templates() -> Dict[str, float]:
+    """Load every template up front, returning how long each took (seconds)"""
+    env = templates.env
+    timings = {}
+    started = time.perf_counter()
+    for name in env.list_templates():
+        template_started = time.perf_counter()
+        env.get_template(name)
+        timings[name] = time.perf_counter() - template_started
+    total = time.perf_counter() - started
+
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+    logger.info(
+        f"compiled {len(timings)} templates in {total * 1000:.1f}ms, slowest: "
+        + ", ".join(
+            f"{name} {seconds * 1000:.1f}ms"
+            for name, seconds in slowest[:SLOWEST_REPORTED]
+        )
+    )
+    return timings
@@ -0,0 +1,92 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src import metrics
+from src.state import AppState
+
+
+class StateMiddleware:
+    """Make the app state available to handlers as `request.state.app_state`"""
+
+    def __init__(self, app: ASGIApp, state: AppState):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["app_state"] = self.state
+        await self.app(scope, receive, send)
+
+
+class SpanMiddleware:
+    """
+    Open a logging span for each request. Its context rides along in a
+    contextvar, so anything logged while handling the request is tagged with it.
+    """
+
+    def __init__(self, app: ASGIApp, state: AppState):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        span = self.state.logger.get_request_span(Request(scope))
+        scope.setdefault("state", {})["span"] = span
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = span.request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        except Exception as e:
+            span.error(str(e))
+            raise
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and size for every request. Routes are labelled by
+    their template (`/blog/{category}/{name}`), anything unrouted as `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.in_flight = metrics.requests_in_flight.labels()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_counted(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            self.in_flight.dec()
+            method = scope["method"]
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            metrics.request_duration.labels(method, template, str(status)).observe(
+                time.perf_counter() - started
+            )
+            metrics.response_size.labels(method, template).observe(size)
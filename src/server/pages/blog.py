@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Depends
 from fastapi.responses import HTMLResponse
 
-from src.leaky import BlogPost
-from ..deps import leaky_url
+from src.leaky import BlogPost, LeakyStore, PostSearch
+from ..deps import MAX_PAGE_SIZE, Paging, leaky, leaky_url, post_search, prefetcher
 from ..handlers import PageResponse, ComponentResponseHandler
 
 router = APIRouter()
@@ -15,28 +17,144 @@ async def blog_index_page(request: Request, base_url: str = Depends(leaky_url)):
     return page.render(request, {})
 
 
+async def posts_fragment(
+    request: Request,
+    paging: Paging,
+    posts: List[BlogPost],
+    version: str,
+    heading: Optional[str] = None,
+):
+    """A page of a list of posts, as rendered by the blog index"""
+    page = paging.page(posts)
+    # Someone's likely to open one of the first few next
+    prefetch = prefetcher(request)
+    if prefetch is not None:
+        prefetch.posts(page.entries)
+
+    # Later pages are just more rows for the list we already rendered
+    if paging.cursor:
+        template = "components/blog/blog_posts_rows.html"
+    else:
+        template = "components/blog/blog_posts_list.html"
+    handler = ComponentResponseHandler(template, cache=True)
+    return await handler.respond(
+        request,
+        {
+            "posts": page.entries,
+            "heading": heading,
+            "next_cursor": page.next_cursor,
+            "next_url": paging.next_url(page),
+        },
+        version=version,
+        params=paging.params(),
+    )
+
+
 @router.get("/blog/api/posts", response_class=HTMLResponse)
-async def blog_index_posts(request: Request, base_url: str = Depends(leaky_url)):
-    """API endpoint for blog posts list component"""
-    posts = await BlogPost.read_all(base_url)
-    handler = ComponentResponseHandler("components/blog/blog_posts_list.html")
-    return await handler.respond(request, {"posts": posts})
+async def blog_index_posts(
+    request: Request,
+    store: LeakyStore = Depends(leaky),
+    paging: Paging = Depends(),
+):
+    """API endpoint for blog posts list component, a page at a time"""
+    index = await store.blog()
+    return await posts_fragment(request, paging, index.entries, index.version)
+
+
+@router.get("/blog/api/categories/{category}", response_class=HTMLResponse)
+async def blog_category_posts(
+    request: Request,
+    category: str,
+    store: LeakyStore = Depends(leaky),
+    paging: Paging = Depends(),
+):
+    """API endpoint for the posts in a category, a page at a time"""
+    posts = (await store.blog()).category(category)
+    if posts is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    # Versioned by just this category's posts, so it outlives changes elsewhere
+    return await posts_fragment(
+        request, paging, posts.entries, f"category:{posts.version}", category
+    )
+
+
+@router.get("/blog/api/tags", response_class=HTMLResponse)
+async def blog_tags(request: Request, store: LeakyStore = Depends(leaky)):
+    """API endpoint for every tag and how many posts have it"""
+    index = await store.blog()
+    handler = ComponentResponseHandler("components/blog/blog_tags.html", cache=True)
+    return await handler.respond(
+        request,
+        {"tags": [{"tag": tag, "count": count} for tag, count in index.tag_counts()]},
+        version=index.version,
+    )
+
+
+@router.get("/blog/api/tags/{tag}", response_class=HTMLResponse)
+async def blog_tag_posts(
+    request: Request,
+    tag: str,
+    store: LeakyStore = Depends(leaky),
+    paging: Paging = Depends(),
+):
+    """API endpoint for the posts with a tag, a page at a time"""
+    posts = (await store.blog()).tag(tag)
+    if posts is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return await posts_fragment(
+        request, paging, posts.entries, f"tag:{posts.version}", f"#{tag}"
+    )
+
+
+@router.get("/blog/api/search", response_class=HTMLResponse)
+async def blog_search(
+    request: Request,
+    q: str = "",
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    search: PostSearch = Depends(post_search),
+):
+    """API endpoint for blog search results, best match first"""
+    results = await search.search(q, limit) if q.strip() else []
+    handler = ComponentResponseHandler("components/blog/blog_search_results.html")
+    return await handler.respond(
+        request,
+        {
+            "query": q,
+            "results": [{"post": post, "score": score} for post, score in results],
+        },
+        params={"q": q, "limit": limit},
+    )
 
 
 @router.get("/blog/{category}/{name}", response_class=HTMLResponse)
 async def blog_post_page(request: Request, category: str, name: str):
     """Blog post detail page"""
-    page = PageResponse("pages/blog/post.html", layout="layouts/app.html")
+    # Any name renders a shell, caching them would let made-up names fill it
+    page = PageResponse("pages/blog/post.html", layout="layouts/app.html", cache=False)
     return page.render(request, {"category": category, "name": name})
 
 
 @router.get("/blog/api/posts/{category}/{name}", response_class=HTMLResponse)
 async def blog_post(
-    request: Request, category: str, name: str, base_url: str = Depends(leaky_url)
+    request: Request, category: str, name: str, store: LeakyStore = Depends(leaky)
 ):
     """API endpoint for single blog post component"""
-    post = await BlogPost.read_one(base_url=base_url, name=f"{category}/{name}")
+    handler = ComponentResponseHandler(
+        "components/blog/blog_post.html",
+        cache=True,
+        cache_control="public, max-age=60",
+    )
+    # The listing has the CID, which is all a revalidation needs, so the
+    #  body is only read for clients that don't have it
+    listed = (await store.blog()).get(f"{category}/{name}")
+    if listed is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if listed.cid:
+        cached = handler.not_modified(request, listed.cid)
+        if cached is not None:
+            return cached
 
+    post = await store.post(category, name)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -48,5 +166,4 @@ async def blog_post(
         "description": post.description,
         "content": post.content,
     }
-    handler = ComponentResponseHandler("components/blog/blog_post.html")
-    return await handler.respond(request, context)
+    return await handler.respond(request, context, version=post.cid)
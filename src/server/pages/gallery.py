@@ -1,9 +1,13 @@
+import mimetypes
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse
 
-from src.leaky import GalleryImage
-from ..deps import leaky_url
+from src.leaky import LeakyStore
+from ..deps import Paging, leaky, leaky_url, prefetcher
 from ..handlers import PageResponse, ComponentResponseHandler
+from ..handlers.media import media_headers, not_modified_media
 
 router = APIRouter()
 
@@ -16,11 +20,34 @@ async def gallery_index_page(request: Request):
 
 
 @router.get("/gallery/api/items", response_class=HTMLResponse)
-async def gallery_items(request: Request, base_url: str = Depends(leaky_url)):
-    """API endpoint for gallery items grid component"""
-    images = await GalleryImage.read_all(base_url)
-    handler = ComponentResponseHandler("components/gallery/gallery_items_grid.html")
-    return await handler.respond(request, {"images": images})
+async def gallery_items(
+    request: Request,
+    store: LeakyStore = Depends(leaky),
+    paging: Paging = Depends(),
+):
+    """API endpoint for gallery items grid component, a page at a time"""
+    page = paging.page(await store.images())
+    # Someone's likely to open one of the first few next
+    prefetch = prefetcher(request)
+    if prefetch is not None:
+        prefetch.images(page.entries)
+
+    # Later pages are just more items for the grid we already rendered
+    if paging.cursor:
+        template = "components/gallery/gallery_items_page.html"
+    else:
+        template = "components/gallery/gallery_items_grid.html"
+    handler = ComponentResponseHandler(template, cache=True)
+    return await handler.respond(
+        request,
+        {
+            "images": page.entries,
+            "next_cursor": page.next_cursor,
+            "next_url": paging.next_url(page),
+        },
+        version=await store.version("gallery"),
+        params=paging.params(),
+    )
 
 
 @router.get("/gallery/{category}/{name}", response_class=HTMLResponse)
@@ -28,19 +55,60 @@ async def gallery_item_page(
     request: Request, category: str, name: str, base_url: str = Depends(leaky_url)
 ):
     """Gallery item detail page"""
-    page = PageResponse("pages/gallery/item.html", layout="layouts/app.html")
+    # Any name renders a shell, caching them would let made-up names fill it
+    page = PageResponse(
+        "pages/gallery/item.html", layout="layouts/app.html", cache=False
+    )
     return page.render(request, {"category": category, "name": name})
 
 
 @router.get("/gallery/api/items/{category}/{name}", response_class=HTMLResponse)
 async def gallery_item(
-    request: Request, category: str, name: str, base_url: str = Depends(leaky_url)
+    request: Request, category: str, name: str, store: LeakyStore = Depends(leaky)
 ):
     """API endpoint for single gallery item component"""
-    image = await GalleryImage.read_one(base_url, category, name)
+    image = await store.image(category, name)
 
     if image is None:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    handler = ComponentResponseHandler("components/gallery/gallery_item.html")
-    return await handler.respond(request, {"image": image})
+    handler = ComponentResponseHandler(
+        "components/gallery/gallery_item.html",
+        cache=True,
+        cache_control="public, max-age=60",
+    )
+    return await handler.respond(request, {"image": image}, version=image.cid)
+
+
+@router.get("/gallery/media/{category}/{name}")
+async def gallery_media(
+    request: Request,
+    category: str,
+    name: str,
+    thumbnail: bool = False,
+    v: Optional[str] = None,
+    store: LeakyStore = Depends(leaky),
+):
+    """Proxy a gallery image (or its thumbnail) out of the on-disk media cache"""
+    if "gallery" not in store.media_urls:
+        raise HTTPException(status_code=404, detail="Media proxy is disabled")
+
+    image = await store.image(category, name)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    variant = "thumb" if thumbnail else "full"
+    headers = media_headers(f'"{image.cid}-{variant}"', v, image.cid)
+    not_modified = not_modified_media(request, headers)
+    if not_modified is not None:
+        return not_modified
+
+    path = await store.image_file(image, thumbnail=thumbnail)
+    if path is None:
+        raise HTTPException(status_code=502, detail="Failed to read image")
+
+    # FileResponse streams from disk (sendfile where the server supports it)
+    media_type, _ = mimetypes.guess_type(name)
+    return FileResponse(
+        path, media_type=media_type or "application/octet-stream", headers=headers
+    )
@@ -18,5 +18,9 @@ def index(request: Request, _state: AppState = Depends(state)):
 @router.get("/about", response_class=HTMLResponse)
 def about(request: Request):
     """About page"""
-    page = PageResponse("pages/about.html", layout="layouts/app.html")
+    page = PageResponse(
+        "pages/about.html",
+        layout="layouts/app.html",
+        cache_control="public, max-age=300",
+    )
     return page.render(request, {})
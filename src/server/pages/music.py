@@ -1,23 +1,151 @@
-from fastapi import APIRouter, Request, Depends
-from fastapi.responses import HTMLResponse
+import mimetypes
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote
 
-from src.leaky.models.tracks import AudioTrack
-from ..deps import leaky_url
+from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
+
+from src.leaky import LeakyStore
+from ..deps import Paging, leaky
 from ..handlers import PageResponse, ComponentResponseHandler
+from ..handlers.media import (
+    RangeNotSatisfiable,
+    media_headers,
+    not_modified_media,
+    parse_range,
+)
 
 router = APIRouter()
 
+# Seeks further than this past what's downloaded go straight to leaky
+READ_AHEAD = 1024 * 1024
+
+# Upstream headers worth passing through when we proxy leaky directly
+PASSTHROUGH_HEADERS = ("content-length", "content-range", "content-encoding")
+
 
 @router.get("/music", response_class=HTMLResponse)
-async def music_index_page(request: Request):
+async def music_index_page(request: Request, track: Optional[str] = None):
     """Music index page"""
     page = PageResponse("pages/music/index.html", layout="layouts/app.html")
-    return page.render(request, {})
+    return page.render(request, {"track": track})
 
 
 @router.get("/music/api/content", response_class=HTMLResponse)
-async def music_content(request: Request, base_url: str = Depends(leaky_url)):
-    """API endpoint for music content component"""
-    tracks = await AudioTrack.read_all(base_url)
-    handler = ComponentResponseHandler("components/music/tracks_table.html")
-    return await handler.respond(request, {"tracks": tracks})
+async def music_content(
+    request: Request,
+    track: Optional[str] = None,
+    store: LeakyStore = Depends(leaky),
+    paging: Paging = Depends(),
+):
+    """
+    API endpoint for music content component, a page at a time.
+    A shared `track` link makes the first page run at least as far as that
+    track so the player can find it.
+    """
+    tracks = await store.tracks()
+    limit = paging.limit
+    if track and not paging.cursor and limit:
+        # The player double encodes names in share links
+        name = unquote(track)
+        position = next((i for i, t in enumerate(tracks) if t.name == name), -1)
+        limit = max(limit, position + 1)
+    page = paging.page(tracks, limit=limit)
+
+    # Later pages are just more rows for the table we already rendered
+    if paging.cursor:
+        template = "components/music/tracks_rows.html"
+    else:
+        template = "components/music/tracks_table.html"
+    handler = ComponentResponseHandler(template, cache=True)
+    return await handler.respond(
+        request,
+        {
+            "tracks": page.entries,
+            "next_cursor": page.next_cursor,
+            "next_url": paging.next_url(page),
+        },
+        version=await store.version("music"),
+        # `track` only matters through how far the page runs
+        params=paging.params(limit),
+    )
+
+
+@router.get("/music/media/{name:path}")
+async def music_media(
+    request: Request,
+    name: str,
+    v: Optional[str] = None,
+    store: LeakyStore = Depends(leaky),
+):
+    """Stream a track with Range support, caching it on disk as it's read"""
+    if "music" not in store.media_urls:
+        raise HTTPException(status_code=404, detail="Music proxy is disabled")
+
+    track = await store.track(name)
+    if track is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+
+    cid = track.cid or ""
+    headers = media_headers(f'"{cid}"', v, cid)
+    if cid:
+        not_modified = not_modified_media(request, headers)
+        if not_modified is not None:
+            return not_modified
+    else:
+        del headers["ETag"]
+
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    range_header = request.headers.get("range")
+
+    # Already on disk, FileResponse handles ranges itself
+    source = await store.track_file(track)
+    if isinstance(source, Path):
+        return FileResponse(source, media_type=media_type, headers=headers)
+
+    # Still downloading -- follow the partial file if the range is close enough
+    if source is not None and source.size is not None:
+        size = source.size
+        try:
+            span = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+
+        start, end = span or (0, size - 1)
+        if start <= source.written + READ_AHEAD:
+            headers["Content-Length"] = str(end - start + 1)
+            if span is not None:
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return StreamingResponse(
+                source.read(start, end),
+                status_code=206 if span is not None else 200,
+                media_type=source.media_type or media_type,
+                headers=headers,
+            )
+
+    # Otherwise pass the request through to leaky over the pooled client
+    upstream = await store.open_track(track, range_header)
+    if upstream.status_code not in (200, 206):
+        await upstream.aclose()
+        raise HTTPException(status_code=502, detail="Failed to read track")
+
+    for header in PASSTHROUGH_HEADERS:
+        if header in upstream.headers:
+            headers[header] = upstream.headers[header]
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        media_type=upstream.headers.get("content-type", media_type),
+        headers=headers,
+        background=BackgroundTask(upstream.aclose),
+    )
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
 
+from src import metrics
+
+from src.leaky import LeakyStore
 from src.logger import RequestSpan
-from src.server.deps import span
+from src.server.deps import leaky, span, state
 
 router = APIRouter()
 
@@ -15,3 +19,22 @@ async def health(
     except Exception as e:
         span.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+
+@router.get("/cache")
+async def cache(store: LeakyStore = Depends(leaky), app_state=Depends(state)):
+    """Counters for sizing our caches"""
+    return {
+        "fragments": app_state.fragments.stats(),
+        "listings": store.cache.stats(),
+        "content": store.content.stats(),
+        "media": store.media.stats() if store.media is not None else None,
+        "flights": store.flight.stats(),
+        "versions": store.versions,
+    }
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Everything we record, in the Prometheus text format"""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,8 +1,26 @@
+import asyncio
 from dataclasses import dataclass
 from enum import Enum as PyEnum
+from typing import List, Optional
 
+import httpx
 
+from src import metrics
 from src.config import Config, Secrets
+from src.fragments import FragmentCache
+from src.leaky import (
+    ContentCache,
+    DiskCache,
+    LeakyStore,
+    LeaderLock,
+    ListingCache,
+    PostSearch,
+    Prefetcher,
+    Refresher,
+    SharedCache,
+    Snapshot,
+    create_client,
+)
 from src.logger import Logger
 
 
@@ -21,12 +39,22 @@ class AppState:
     config: Config
     logger: Logger
     secrets: Secrets
+    leaky_client: Optional[httpx.AsyncClient] = None
+    leaky: Optional[LeakyStore] = None
+    refresher: Optional[Refresher] = None
+    fragments: Optional[FragmentCache] = None
+    search: Optional[PostSearch] = None
+    prefetcher: Optional[Prefetcher] = None
+    loop_lag: Optional[metrics.LoopLagMonitor] = None
+    shared: Optional[SharedCache] = None
+    leader: Optional[LeaderLock] = None
+    _snapshot_task: Optional[asyncio.Task] = None
 
     @classmethod
     def from_config(cls, config: Config):
         state = cls(
             config=config,
-            logger=Logger(config.log_path, config.debug),
+            logger=Logger(config.log_path, config.debug, config.log_json),
             secrets=config.secrets,
         )
         return state
@@ -34,10 +62,172 @@ class AppState:
     async def startup(self):
         """run any startup logic here"""
         try:
-            pass
+            self.leaky_client = create_client(
+                max_connections=self.config.leaky_max_connections,
+                max_keepalive_connections=self.config.leaky_max_keepalive_connections,
+                keepalive_expiry=self.config.leaky_keepalive_expiry,
+                timeout=self.config.leaky_timeout,
+                observer=metrics.observe_leaky,
+            )
+            # Workers share what they read, and elect one to do what only
+            #  needs doing once
+            if self.config.workers > 1 and not self.config.dev_mode:
+                self.shared = SharedCache(
+                    self.config.shared_cache_path,
+                    max_bytes=self.config.shared_cache_max_bytes,
+                )
+                self.leader = LeaderLock(f"{self.config.shared_cache_path}.lock")
+
+            media = None
+            media_urls = {}
+            if self.config.gallery_proxy:
+                media_urls["gallery"] = "/gallery/media"
+            if self.config.music_proxy:
+                media_urls["music"] = "/music/media"
+            if media_urls:
+                media = DiskCache(
+                    self.config.media_cache_dir,
+                    max_bytes=self.config.media_cache_max_bytes,
+                )
+            self.leaky = LeakyStore(
+                self.config.leaky_url,
+                self.leaky_client,
+                cache=ListingCache(max_entries=self.config.leaky_cache_max_entries),
+                content=ContentCache(
+                    max_bytes=self.config.leaky_content_cache_max_bytes
+                ),
+                ttls={
+                    "blog": self.config.leaky_cache_ttl_blog,
+                    "gallery": self.config.leaky_cache_ttl_gallery,
+                    "music": self.config.leaky_cache_ttl_music,
+                },
+                media=media,
+                media_urls=media_urls,
+                parse_in_thread_bytes=self.config.leaky_parse_in_thread_bytes,
+                shared=self.shared,
+                snapshots=self.config.snapshot_dir is not None,
+            )
+
+            # Rendered fragments go stale with the content they were rendered from
+            self.fragments = FragmentCache(
+                max_bytes=self.config.fragment_cache_max_bytes, shared=self.shared
+            )
+            self.leaky.subscribe(self._on_content_change)
+
+            # Start from the last snapshot, leaky catches us up in the background
+            if self.config.snapshot_dir is not None:
+                snapshot = Snapshot.open(self.config.snapshot_dir)
+                if snapshot is not None:
+                    await self.leaky.restore(
+                        snapshot,
+                        track_versions=self.config.leaky_refresh_interval > 0,
+                    )
+                    self.logger.logger.info(
+                        f"restored {', '.join(self.leaky.listings)} from snapshot"
+                    )
+            # Index posts for search in the background, it follows the listing
+            #  from here
+            self.search = PostSearch(self.leaky, leader=self.leader)
+            self.search.schedule()
+
+            # Warm up what's likely to be opened next while we're quiet
+            if self.config.prefetch_count > 0:
+                in_flight = metrics.requests_in_flight.labels()
+                self.prefetcher = Prefetcher(
+                    self.leaky,
+                    count=self.config.prefetch_count,
+                    in_flight=lambda: in_flight.value,
+                )
+                self.prefetcher.start()
+
+            metrics.registry.add_collector(self._cache_metrics)
+            self.loop_lag = metrics.LoopLagMonitor()
+            self.loop_lag.start()
+
+            # Watch leaky for new content in the background
+            if self.config.leaky_refresh_interval > 0:
+                self.refresher = Refresher(
+                    self.leaky,
+                    interval=self.config.leaky_refresh_interval,
+                    leader=self.leader,
+                )
+                self.refresher.start()
         except Exception as e:
             raise AppStateException(AppStateExceptionType.startup_failed, str(e)) from e
 
+    def _on_content_change(self, collection: str, old: Optional[str], new: str):
+        if self.fragments is not None and old is not None:
+            self.fragments.invalidate(version=old)
+        if collection == "blog" and self.search is not None:
+            self.search.schedule()
+        # Keep the snapshot in step with what we're serving
+        if (
+            self.config.snapshot_dir is not None
+            and self._snapshot_task is None
+            and self._leads()
+        ):
+            self._snapshot_task = asyncio.create_task(self._save_snapshot())
+
+    def _leads(self) -> bool:
+        """Whether this is the one worker that writes shared state, e.g. snapshots"""
+        return self.leader is None or self.leader.acquire()
+
+    async def _save_snapshot(self):
+        try:
+            if self.leaky is not None and self.config.snapshot_dir is not None:
+                await self.leaky.save_snapshot(self.config.snapshot_dir)
+        except Exception as e:
+            self.logger.logger.warning(f"failed to write snapshot: {e}")
+        finally:
+            self._snapshot_task = None
+
+    def _cache_metrics(self) -> List[metrics.Metric]:
+        caches = {}
+        if self.fragments is not None:
+            caches["fragments"] = self.fragments.stats()
+        if self.leaky is not None:
+            caches["listings"] = self.leaky.cache.stats()
+            caches["content"] = self.leaky.content.stats()
+            if self.leaky.media is not None:
+                caches["media"] = self.leaky.media.stats()
+        if self.shared is not None:
+            caches["shared"] = self.shared.stats()
+        return metrics.cache_metrics(caches)
+
     async def shutdown(self):
         """run any shutdown logic here"""
-        pass
+        metrics.registry.remove_collector(self._cache_metrics)
+        if self.loop_lag is not None:
+            await self.loop_lag.stop()
+            self.loop_lag = None
+        if self.refresher is not None:
+            await self.refresher.stop()
+            self.refresher = None
+        if self.prefetcher is not None:
+            await self.prefetcher.stop()
+            self.prefetcher = None
+        if self.search is not None:
+            await self.search.close()
+            self.search = None
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        if self.leaky is not None:
+            # Save anything read since, e.g. posts that were only just opened
+            if (
+                self.config.snapshot_dir is not None
+                and self.leaky.snapshot_dirty
+                and self._leads()
+            ):
+                await self._save_snapshot()
+            await self.leaky.close()
+            self.leaky = None
+        if self.leader is not None:
+            self.leader.release()
+            self.leader = None
+        if self.shared is not None:
+            # Commits whatever's still queued
+            await asyncio.to_thread(self.shared.close)
+            self.shared = None
+        if self.leaky_client is not None:
+            await self.leaky_client.aclose()
+            self.leaky_client = None
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Optional
+
+from src.leaky import ListingCache
+
+
+class Source:
+    """A fetch that counts its calls and can be held up or made to fail"""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.error: Optional[Exception] = None
+
+    async def fetch(self) -> str:
+        self.calls += 1
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return f"v{self.calls}"
+
+
+async def test_fresh_entries_are_served_without_fetching():
+    cache = ListingCache()
+    source = Source()
+    assert await cache.get("blog", 60, source.fetch) == "v1"
+    assert await cache.get("blog", 60, source.fetch) == "v1"
+    assert source.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+async def test_expired_entries_are_served_stale_while_one_refresh_runs():
+    cache = ListingCache()
+    source = Source()
+    await cache.get("blog", 0, source.fetch)
+
+    source.gate.clear()
+    stale = [await cache.get("blog", 0, source.fetch) for _ in range(3)]
+    assert stale == ["v1", "v1", "v1"]
+    source.gate.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    # Only the one refresh ran, and what it fetched is served from now on
+    assert source.calls == 2
+    assert cache.peek("blog") == "v2"
+    assert cache.stats()["stale_hits"] == 3
+    await cache.close()
+
+
+async def test_failed_refreshes_keep_the_stale_value():
+    cache = ListingCache()
+    source = Source()
+    await cache.get("blog", 0, source.fetch)
+
+    source.error = RuntimeError("leaky is down")
+    assert await cache.get("blog", 60, source.fetch) == "v1"
+    await asyncio.sleep(0)
+    assert cache.peek("blog") == "v1"
+    assert cache.stats()["refresh_errors"] == 1
+    # And it isn't retried until another ttl has passed
+    assert await cache.get("blog", 60, source.fetch) == "v1"
+    assert source.calls == 2
+
+
+async def test_least_recently_used_listings_are_evicted():
+    cache = ListingCache(max_entries=2)
+    source = Source()
+    await cache.get("blog", 60, source.fetch)
+    await cache.get("gallery", 60, source.fetch)
+    await cache.get("blog", 60, source.fetch)
+    await cache.get("music", 60, source.fetch)
+    assert cache.peek("gallery") is None
+    assert cache.peek("blog") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_close_cancels_refreshes():
+    cache = ListingCache()
+    source = Source()
+    await cache.get("blog", 0, source.fetch)
+    source.gate.clear()
+    await cache.get("blog", 0, source.fetch)
+    await cache.close()
+    assert cache.peek("blog") == "v1"
@@ -0,0 +1,120 @@
+import json
+from types import SimpleNamespace
+from typing import List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from starlette.requests import Request
+
+from src.fragments import FragmentCache
+from src.leaky import LeakyStore
+from src.server.middleware import StateMiddleware
+from src.server.pages import blog
+from src.server.handlers.caching import (
+    cache_headers,
+    is_not_modified,
+    make_etag,
+    not_modified,
+)
+
+
+def request(headers=None) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in (headers or {}).items()
+            ],
+        }
+    )
+
+
+def test_etags_follow_their_parts():
+    etag = make_etag("template.html", "cid-1", "/blog?")
+    assert etag == make_etag("template.html", "cid-1", "/blog?")
+    assert etag != make_etag("template.html", "cid-2", "/blog?")
+    assert etag != make_etag("template.html", "cid-1", "/gallery?")
+    assert etag.startswith('"') and etag.endswith('"')
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ('"xyz"', False),
+        ("*", True),
+    ],
+)
+def test_is_not_modified(header, expected):
+    headers = {"If-None-Match": header} if header is not None else {}
+    assert is_not_modified(request(headers), '"abc"') is expected
+
+
+def test_not_modified_keeps_caching_headers():
+    response = not_modified('"abc"', "no-cache")
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["cache-control"] == "no-cache"
+    assert "HX-Request" in response.headers["vary"]
+
+
+def test_cache_headers_without_etag():
+    assert "ETag" not in cache_headers(None, "no-store")
+
+
+async def test_blog_post_revalidates_without_reading_the_body():
+    requests: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/blog":
+            listing = [
+                {
+                    "path": "/notes/post.md",
+                    "cid": "bafy-post",
+                    "is_dir": False,
+                    "object": {
+                        "created_at": [2024, 1, 1, 0, 0, 0, 0, 0, 0],
+                        "properties": {"title": "Post", "description": ""},
+                    },
+                }
+            ]
+            return httpx.Response(200, content=json.dumps(listing))
+        return httpx.Response(200, text="<p>body</p>")
+
+    leaky = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    store = LeakyStore("http://leaky", leaky)
+    state = SimpleNamespace(
+        leaky=store, fragments=FragmentCache(), config=SimpleNamespace(dev_mode=False)
+    )
+    app = FastAPI()
+    app.include_router(blog.router)
+    app.add_middleware(StateMiddleware, state=state)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://test",
+        headers={"HX-Request": "true"},
+    ) as client:
+        first = await client.get("/blog/api/posts/notes/post.md")
+        # Start over with only the listing cached
+        store.content.clear()
+        requests.clear()
+        again = await client.get(
+            "/blog/api/posts/notes/post.md",
+            headers={"If-None-Match": first.headers["etag"]},
+        )
+
+    assert first.status_code == 200 and "<p>body</p>" in first.text
+    assert again.status_code == 304
+    assert requests == []
+    await store.close()
+    await leaky.aclose()
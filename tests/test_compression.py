@@ -0,0 +1,37 @@
+import gzip
+
+import brotli
+import pytest
+
+from src.compression import accepted_encodings, choose_encoding, compress
+
+
+def test_accepted_encodings_skips_refused():
+    assert accepted_encodings("gzip;q=0, br;q=0.5, Deflate") == {"br", "deflate"}
+    assert accepted_encodings("gzip;q=nope") == set()
+    assert accepted_encodings("") == set()
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_gzip_is_reproducible():
+    data = b"<p>hello</p>" * 100
+    assert compress(data, "gzip") == compress(data, "gzip")
+    assert gzip.decompress(compress(data, "gzip", cached=True)) == data
+
+
+def test_brotli_round_trips():
+    data = b"<p>hello</p>" * 100
+    assert brotli.decompress(compress(data, "br", cached=True)) == data
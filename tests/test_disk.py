@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from src.leaky import DiskCache
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    first = await cache.write("bafy-1", chunks(b"1234"))
+    await cache.write("bafy-2", chunks(b"12", b"34"))
+    # Reading one makes it the most recently used
+    assert cache.path("bafy-1") == first
+    await cache.write("bafy-3", chunks(b"1234"))
+
+    assert "bafy-2" not in cache and not (tmp_path / "bafy-2").exists()
+    assert first.read_bytes() == b"1234" and "bafy-3" in cache
+    assert cache.stats()["bytes"] == 8 and cache.stats()["evictions"] == 1
+
+
+async def test_an_entry_bigger_than_the_cache_is_kept_alone(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=4)
+    await cache.write("bafy-1", chunks(b"1234"))
+    await cache.write("bafy-2", chunks(b"123456"))
+    assert "bafy-1" not in cache and "bafy-2" in cache
+
+
+async def test_failed_writes_leave_nothing_behind(tmp_path):
+    cache = DiskCache(str(tmp_path))
+
+    async def broken():
+        yield b"12"
+        raise ConnectionError("leaky went away")
+
+    with pytest.raises(ConnectionError):
+        await cache.write("bafy-1", broken())
+    assert "bafy-1" not in cache and os.listdir(tmp_path) == []
+
+
+async def test_restarts_pick_up_what_was_cached(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    older = await cache.write("bafy-1", chunks(b"1234"))
+    await cache.write("gallery/a b.jpg", chunks(b"56"))
+    os.utime(older, (0, 0))
+    cache.reserve()  # A partial file a crash left behind
+
+    # Oldest first, so that's what goes to fit the smaller cache
+    again = DiskCache(str(tmp_path), max_bytes=5)
+    # Unsafe keys are stored under a hash, never as a path
+    assert again.path("gallery/a b.jpg") is not None
+    assert again.path("bafy-1") is None
+    assert again.stats()["bytes"] == 2
@@ -0,0 +1,30 @@
+import pytest
+
+from src.export import Output, output_path, url
+
+
+@pytest.mark.parametrize(
+    "segments, expected",
+    [
+        (("blog", "api", "tags", "a b"), "/blog/api/tags/a%20b"),
+        (("blog", "api", "tags", "a/b"), "/blog/api/tags/a%2Fb"),
+        (("blog", "api", "tags", "../x"), "/blog/api/tags/..%2Fx"),
+        (("blog", "api", "tags", ".."), None),
+        (("blog", "api", "tags", ""), None),
+    ],
+)
+def test_url_quotes_each_segment(segments, expected):
+    assert url(*segments) == expected
+
+
+def test_files_are_written_where_static_hosts_look():
+    assert Output("/", "").file == "index.html"
+    assert Output("/blog/api/tags/a%20b", "").file == "blog/api/tags/a b/index.html"
+    # A slash in a name never becomes a directory
+    assert Output("/blog/api/tags/a%2Fb", "").file == "blog/api/tags/a%2Fb/index.html"
+
+
+def test_output_path_stays_in_the_directory(tmp_path):
+    inside = output_path(str(tmp_path), Output("/blog/api/tags/..%2F..%2Fx", ""))
+    assert inside is not None and inside.startswith(str(tmp_path))
+    assert output_path(str(tmp_path), Output("/../../etc", "")) is None
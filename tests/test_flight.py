@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from src.leaky import SingleFlight
+
+
+async def test_concurrent_calls_share_one():
+    flight = SingleFlight()
+    gate = asyncio.Event()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await gate.wait()
+        return calls
+
+    waiting = [asyncio.create_task(flight.do("blog", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.waiters() == {"blog": 3}
+    gate.set()
+
+    assert await asyncio.gather(*waiting) == [1, 1, 1]
+    assert calls == 1
+    assert flight.stats()["shared"] == 2 and flight.waiters() == {}
+    # Once it's done the next call goes out again
+    assert await flight.do("blog", fetch) == 2
+
+
+async def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("leaky is down")
+
+    results = await asyncio.gather(
+        flight.do("blog", fail), flight.do("blog", fail), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_a_cancelled_caller_leaves_the_call_running_for_the_rest():
+    flight = SingleFlight()
+    gate = asyncio.Event()
+
+    async def fetch() -> str:
+        await gate.wait()
+        return "listing"
+
+    impatient = asyncio.create_task(flight.do("blog", fetch))
+    patient = asyncio.create_task(flight.do("blog", fetch))
+    await asyncio.sleep(0)
+    impatient.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await impatient
+    assert flight.waiters() == {"blog": 1}
+
+    gate.set()
+    assert await patient == "listing"
+    assert flight.waiters() == {}
+
+
+async def test_a_call_every_caller_abandoned_still_finishes():
+    flight = SingleFlight()
+    gate = asyncio.Event()
+    done = asyncio.Event()
+
+    async def fetch():
+        await gate.wait()
+        done.set()
+        raise RuntimeError("nobody is listening")
+
+    caller = asyncio.create_task(flight.do("blog", fetch))
+    await asyncio.sleep(0)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+
+    gate.set()
+    await done.wait()
+    await asyncio.sleep(0)
+    # It's forgotten, and its error was retrieved rather than left dangling
+    assert flight.waiters() == {} and flight.stats()["calls"] == 1
+    assert await flight.do("blog", lambda: asyncio.sleep(0, "again")) == "again"
@@ -0,0 +1,153 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from jinja2 import ChoiceLoader, DictLoader
+
+from src.fragments import FragmentCache
+from src.server.handlers.component import ComponentResponseHandler
+from src.server.handlers.page import PageResponse
+from src.server.handlers.templates import templates
+
+TEMPLATE = "tests/item.html"
+
+# Every item has the same content, as far as the version can tell
+VERSION = "bafy-shared"
+
+
+@pytest.fixture
+def render_item(monkeypatch):
+    monkeypatch.setattr(
+        templates.env,
+        "loader",
+        ChoiceLoader(
+            [DictLoader({TEMPLATE: "<p>{{ name }}</p>"}), templates.env.loader]
+        ),
+    )
+
+    def make(dev_mode: bool = False):
+        fragments = FragmentCache()
+        app_state = SimpleNamespace(
+            fragments=fragments, config=SimpleNamespace(dev_mode=dev_mode)
+        )
+        handler = ComponentResponseHandler(TEMPLATE, cache=True)
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def attach_state(request: Request, call_next):
+            request.state.app_state = app_state
+            return await call_next(request)
+
+        @app.get("/items/{name}")
+        async def item(request: Request, name: str, a: str = "", b: str = ""):
+            return await handler.respond(
+                request, {"name": name}, version=VERSION, params={"a": a, "b": b}
+            )
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://test",
+            headers={"HX-Request": "true"},
+        )
+        return client, fragments
+
+    return make
+
+
+async def test_paths_sharing_a_version_get_their_own_fragment(render_item):
+    client, fragments = render_item()
+    async with client:
+        first = await client.get("/items/one")
+        second = await client.get("/items/two")
+        again = await client.get("/items/two")
+
+    assert first.text == "<p>one</p>"
+    assert second.text == "<p>two</p>"
+    assert again.text == "<p>two</p>"
+    assert first.headers["etag"] != second.headers["etag"]
+    assert len(fragments.keys()) == 2
+
+
+async def test_query_params_are_part_of_the_key(render_item):
+    client, fragments = render_item()
+    async with client:
+        await client.get("/items/one?b=2&a=1")
+        await client.get("/items/one?a=1&b=2")
+        await client.get("/items/one?a=2")
+    assert len(fragments.keys()) == 2
+
+
+async def test_params_the_route_ignores_share_a_key(render_item):
+    client, fragments = render_item()
+    async with client:
+        first = await client.get("/items/one?a=1")
+        second = await client.get("/items/one?a=1&_=12345")
+    assert first.headers["etag"] == second.headers["etag"]
+    assert len(fragments.keys()) == 1
+
+
+async def test_cached_fragments_answer_conditional_requests(render_item):
+    client, _ = render_item()
+    async with client:
+        first = await client.get("/items/one")
+        cached = await client.get(
+            "/items/one", headers={"If-None-Match": first.headers["etag"]}
+        )
+    assert cached.status_code == 304
+
+
+async def test_dev_mode_skips_the_cache(render_item):
+    client, fragments = render_item(dev_mode=True)
+    async with client:
+        response = await client.get("/items/one")
+    assert response.text == "<p>one</p>"
+    assert "etag" not in response.headers
+    assert fragments.keys() == []
+
+
+def test_invalidate_by_version():
+    fragments = FragmentCache()
+    fragments.put_fragment(("a.html", "v1", "/a?"), b"a")
+    fragments.put_fragment(("a.html", "v2", "/b?"), b"b")
+    fragments.invalidate(version="v1")
+    assert fragments.get_fragment(("a.html", "v1", "/a?")) is None
+    assert fragments.get_fragment(("a.html", "v2", "/b?")) == b"b"
+
+
+async def test_pages_can_opt_out_of_the_cache(monkeypatch):
+    monkeypatch.setattr(
+        templates.env,
+        "loader",
+        ChoiceLoader(
+            [DictLoader({TEMPLATE: "<p>{{ name }}</p>"}), templates.env.loader]
+        ),
+    )
+    fragments = FragmentCache()
+    app_state = SimpleNamespace(
+        fragments=fragments, config=SimpleNamespace(dev_mode=False)
+    )
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def attach_state(request: Request, call_next):
+        request.state.app_state = app_state
+        return await call_next(request)
+
+    @app.get("/cached/{name}")
+    def cached(request: Request, name: str):
+        return PageResponse(TEMPLATE).render(request, {"name": name})
+
+    @app.get("/uncached/{name}")
+    def uncached(request: Request, name: str):
+        return PageResponse(TEMPLATE, cache=False).render(request, {"name": name})
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://test",
+        headers={"HX-Request": "true"},
+    ) as client:
+        await client.get("/cached/one")
+        response = await client.get("/uncached/made-up")
+    assert response.text == "<p>made-up</p>" and "etag" in response.headers
+    assert len(fragments.keys()) == 1
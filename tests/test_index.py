@@ -0,0 +1,40 @@
+from src.leaky import BlogIndex
+
+from .utils import post
+
+
+def index(*posts) -> BlogIndex:
+    return BlogIndex(list(posts), version="listing")
+
+
+def test_filtered_views_follow_the_listing():
+    blog = index(
+        post("b", category="notes", days=2, tags=["x"]),
+        post("a", days=1, tags=["x", "y"]),
+    )
+    notes = blog.category("notes")
+    assert notes is not None and [p.name for p in notes.entries] == ["b"]
+    tagged = blog.tag("x")
+    assert tagged is not None and [p.name for p in tagged.entries] == ["b", "a"]
+    assert blog.tag_counts() == [("x", 2), ("y", 1)]
+    assert blog.category("missing") is None
+
+
+def test_sub_index_versions_cover_what_gets_rendered():
+    before = index(post("a", cid="cid-a", tags=["x"]), post("b", category="notes"))
+    # Same content, new title -- only the views holding that post change
+    after = index(
+        post("a", cid="cid-a", tags=["x"], title="Renamed"),
+        post("b", category="notes"),
+    )
+
+    def versions(blog: BlogIndex):
+        return {
+            name: view.version
+            for name, view in [*blog.by_category.items(), *blog.by_tag.items()]
+        }
+
+    old, new = versions(before), versions(after)
+    assert old["thoughts"] != new["thoughts"]
+    assert old["x"] != new["x"]
+    assert old["notes"] == new["notes"]
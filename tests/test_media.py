@@ -0,0 +1,72 @@
+import asyncio
+from typing import Optional
+
+import pytest
+
+from src.leaky import DiskCache, Download
+from src.server.handlers.media import RangeNotSatisfiable, parse_range
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        # Not something we handle, so the whole file is sent
+        ("bytes=0-1,5-9", None),
+        ("items=0-1", None),
+        ("bytes=a-b", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-100", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+async def chunks(*parts: bytes, gate: Optional[asyncio.Event] = None):
+    for i, part in enumerate(parts):
+        # Hold the rest back until told, so readers catch up to the writer
+        if i and gate is not None:
+            await gate.wait()
+        yield part
+
+
+async def read_all(download: Download, start: int, end: int) -> bytes:
+    return b"".join([chunk async for chunk in download.read(start, end)])
+
+
+async def test_readers_follow_a_download_as_it_grows(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    download = Download(cache, "bafy-track")
+    download.begin(10, "audio/mpeg")
+    gate = asyncio.Event()
+    writing = asyncio.create_task(download.write(chunks(b"01234", b"56789", gate=gate)))
+
+    reading = asyncio.create_task(read_all(download, 3, 8))
+    await asyncio.sleep(0.05)
+    assert not reading.done() and download.written == 5
+    gate.set()
+
+    assert await reading == b"345678"
+    path = await writing
+    assert cache.path("bafy-track") == path
+    # Later readers get the committed file
+    assert await read_all(download, 0, 9) == b"0123456789"
+
+
+async def test_reading_a_failed_download_is_an_io_error(tmp_path):
+    download = Download(DiskCache(str(tmp_path)), "bafy-track")
+    await download.fail(RuntimeError("leaky went away"))
+    assert not download.temp_path.exists()
+    with pytest.raises(IOError, match="download of bafy-track failed"):
+        await read_all(download, 0, 9)
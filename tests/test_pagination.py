@@ -0,0 +1,55 @@
+import pytest
+
+from src.leaky import InvalidCursor, paginate
+from src.leaky.pagination import decode_cursor, encode_cursor
+
+from .utils import post
+
+
+def newest_first(count: int):
+    return [post(f"post-{i}.md", days=-i) for i in range(count)]
+
+
+def test_pages_follow_on():
+    posts = newest_first(5)
+
+    first = paginate(posts, None, 2)
+    assert [p.name for p in first.entries] == ["post-0.md", "post-1.md"]
+    second = paginate(posts, first.next_cursor, 2)
+    assert [p.name for p in second.entries] == ["post-2.md", "post-3.md"]
+    last = paginate(posts, second.next_cursor, 2)
+    assert [p.name for p in last.entries] == ["post-4.md"]
+    assert last.next_cursor is None
+
+
+def test_zero_limit_is_everything_left():
+    posts = newest_first(5)
+    page = paginate(posts, encode_cursor(posts[1]), 0)
+    assert [p.name for p in page.entries] == ["post-2.md", "post-3.md", "post-4.md"]
+    assert page.next_cursor is None
+
+
+def test_cursor_survives_its_entry_being_removed():
+    posts = newest_first(5)
+    cursor = paginate(posts, None, 2).next_cursor
+    del posts[1]
+    page = paginate(posts, cursor, 2)
+    assert [p.name for p in page.entries] == ["post-2.md", "post-3.md"]
+
+
+def test_cursor_steps_past_ties():
+    posts = [post(f"post-{i}.md") for i in range(4)]
+    first = paginate(posts, None, 2)
+    second = paginate(posts, first.next_cursor, 2)
+    assert [p.name for p in first.entries + second.entries] == [p.name for p in posts]
+
+
+def test_cursor_round_trips():
+    entry = post("post.md", category="notes", days=3)
+    assert decode_cursor(encode_cursor(entry)) == (entry.path, entry.created_at)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bm90IGpzb24", "WzFd"])
+def test_rejects_cursors_we_didnt_hand_out(cursor):
+    with pytest.raises(InvalidCursor):
+        paginate(newest_first(3), cursor, 2)
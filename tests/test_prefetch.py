@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List, cast
+
+from src.leaky import ContentCache, LeakyStore, Prefetcher
+
+from .utils import post
+
+
+class Store:
+    """Just enough of a LeakyStore to warm posts, recording what was read"""
+
+    def __init__(self):
+        self.content = ContentCache()
+        self.read: List[str] = []
+
+    async def post(self, category: str, name: str) -> Any:
+        self.read.append(name)
+        return SimpleNamespace()
+
+
+def prefetcher(store: Store, **kwargs) -> Prefetcher:
+    return Prefetcher(cast(LeakyStore, store), **kwargs)
+
+
+async def settle(prefetch: Prefetcher):
+    async with asyncio.timeout(1):
+        while prefetch.stats()["pending"]:
+            await asyncio.sleep(0.01)
+
+
+async def test_the_top_posts_are_warmed_once_each():
+    store = Store()
+    store.content.put("cid-b", "<p>b</p>", 8)
+    prefetch = prefetcher(store, count=3)
+    posts = [post(name, cid=f"cid-{name}") for name in "abcd"]
+    prefetch.posts(posts)
+    # Already queued, so not again
+    prefetch.posts(posts)
+
+    prefetch.start()
+    await settle(prefetch)
+    await prefetch.stop()
+    # b is already cached, d is past the top three
+    assert store.read == ["a", "c"]
+    assert prefetch.stats()["warmed"] == 2 and prefetch.stats()["scheduled"] == 2
+
+
+async def test_warm_ups_hold_off_while_the_server_is_busy():
+    store = Store()
+    busy = 10
+    prefetch = prefetcher(store, in_flight=lambda: busy)
+    prefetch.posts([post("a", cid="cid-a")])
+    prefetch.start()
+
+    await asyncio.sleep(0.2)
+    assert store.read == []
+    busy = 1
+    await settle(prefetch)
+    await prefetch.stop()
+    assert store.read == ["a"]
+
+
+async def test_a_full_queue_drops_new_work():
+    prefetch = prefetcher(Store(), max_pending=1)
+
+    async def warm():
+        pass
+
+    assert prefetch.schedule("one", warm)
+    assert not prefetch.schedule("two", warm)
+    assert prefetch.stats()["dropped"] == 1
+
+
+async def test_failed_warm_ups_are_counted_and_forgotten():
+    prefetch = prefetcher(Store())
+
+    async def fail():
+        raise RuntimeError("leaky is down")
+
+    prefetch.schedule("post:cid-a", fail)
+    prefetch.start()
+    await settle(prefetch)
+    # It can be tried again next time the list is rendered
+    assert prefetch.schedule("post:cid-a", fail)
+    await prefetch.stop()
+    assert prefetch.stats()["errors"] == 1
@@ -0,0 +1,98 @@
+import asyncio
+import json
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import pytest
+
+from src.leaky import LeakyStore, Refresher
+
+
+class Leaky:
+    """A leaky whose blog directory CID can be bumped, counting listing reads"""
+
+    def __init__(self):
+        self.blog_cid = "bafy-blog-1"
+        self.listing_reads = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/":
+            root = [{"path": "/blog", "cid": self.blog_cid, "is_dir": True}]
+            return httpx.Response(200, content=json.dumps(root))
+        if request.url.path == "/blog":
+            self.listing_reads += 1
+            post = {
+                "path": "/notes/post.md",
+                "cid": f"{self.blog_cid}-post",
+                "is_dir": False,
+                "object": {
+                    "created_at": [2024, 1, 1, 0, 0, 0, 0, 0, 0],
+                    "properties": {"title": "Post", "description": ""},
+                },
+            }
+            return httpx.Response(200, content=json.dumps([post]))
+        return httpx.Response(404)
+
+
+@pytest.fixture
+async def leaky():
+    leaky = Leaky()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(leaky.handler))
+    store = LeakyStore("http://leaky", client)
+    changes: List[Tuple[str, Optional[str], str]] = []
+    store.subscribe(lambda *change: changes.append(change))
+    yield leaky, store, changes
+    await store.close()
+    await client.aclose()
+
+
+async def test_collections_are_only_reread_when_their_cid_changes(leaky):
+    leaky, store, changes = leaky
+    refresher = Refresher(store)
+
+    assert await refresher.poll() == ["blog"]
+    assert (await store.blog()).version == "bafy-blog-1"
+    assert await refresher.poll() == []
+    assert leaky.listing_reads == 1
+
+    leaky.blog_cid = "bafy-blog-2"
+    assert await refresher.poll() == ["blog"]
+    index = await store.blog()
+    assert index.version == "bafy-blog-2"
+    assert index.get("notes/post.md").cid == "bafy-blog-2-post"
+    assert leaky.listing_reads == 2
+    assert changes == [
+        ("blog", None, "bafy-blog-1"),
+        ("blog", "bafy-blog-1", "bafy-blog-2"),
+    ]
+
+
+async def test_tracked_collections_dont_expire(leaky):
+    leaky, store, _ = leaky
+    store.ttls = {"blog": 0}
+    await Refresher(store).poll()
+    for _ in range(3):
+        await store.blog()
+    assert leaky.listing_reads == 1
+    assert store.cache.stats()["stale_hits"] == 0
+
+
+async def test_failed_polls_are_counted_and_retried(leaky, monkeypatch):
+    leaky, store, changes = leaky
+    failures = 0
+
+    async def unreachable() -> Dict[str, str]:
+        nonlocal failures
+        failures += 1
+        raise httpx.ConnectError("leaky is down")
+
+    monkeypatch.setattr(store, "root_versions", unreachable)
+    refresher = Refresher(store, interval=0.01)
+    refresher.start()
+    while failures < 3:
+        await asyncio.sleep(0.01)
+    await refresher.stop()
+
+    # Nothing we're serving was touched along the way
+    assert refresher.errors >= 3 and refresher.refreshes == 0
+    assert store.versions == {} and changes == []
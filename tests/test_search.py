@@ -0,0 +1,77 @@
+from src.leaky import SearchIndex
+from src.leaky.search import strip_html, tokenize
+
+from .utils import post
+
+
+def paths(results):
+    return [path for path, _ in results]
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Quick brown-fox, and THE dog") == [
+        "quick",
+        "brown",
+        "fox",
+        "dog",
+    ]
+
+
+def test_strip_html_drops_markup_and_scripts():
+    text = strip_html("<h1>Hi &amp; bye</h1><script>alert(1)</script><p>there</p>")
+    assert "alert" not in text
+    assert text.split() == ["Hi", "&", "bye", "there"]
+
+
+def test_title_outranks_content():
+    index = SearchIndex()
+    index.add(post("in-title.md", title="Rust notes"), "nothing to see")
+    index.add(post("in-content.md", title="Other notes"), "a post about rust")
+    assert paths(index.search("rust")) == [
+        "thoughts/in-title.md",
+        "thoughts/in-content.md",
+    ]
+
+
+def test_rarer_terms_count_for_more():
+    index = SearchIndex()
+    index.add(post("common.md"), "python python")
+    index.add(post("both.md"), "python sqlite")
+    index.add(post("other.md"), "python")
+    assert paths(index.search("python sqlite"))[0] == "thoughts/both.md"
+
+
+def test_shorter_documents_win_ties():
+    index = SearchIndex()
+    index.add(post("short.md"), "caching")
+    index.add(post("long.md"), "caching " + "filler words here " * 50)
+    assert paths(index.search("caching")) == ["thoughts/short.md", "thoughts/long.md"]
+
+
+def test_prefixes_match_but_rank_below_exact():
+    index = SearchIndex()
+    index.add(post("exact.md"), "cache")
+    index.add(post("longer.md"), "caches")
+    assert paths(index.search("cache")) == ["thoughts/exact.md", "thoughts/longer.md"]
+    # Too short to expand
+    assert index.search("ca") == []
+
+
+def test_replacing_and_removing_documents():
+    index = SearchIndex()
+    index.add(post("post.md", cid="v1"), "old words")
+    index.add(post("post.md", cid="v2"), "new words")
+    assert len(index) == 1
+    assert index.search("old") == []
+    assert paths(index.search("new")) == ["thoughts/post.md"]
+
+    index.remove("thoughts/post.md")
+    assert index.search("new") == []
+    assert index.postings == {}
+
+
+def test_limit():
+    index = SearchIndex()
+    for i in range(5):
+        index.add(post(f"post-{i}.md"), "shared")
+    assert len(index.search("shared", limit=3)) == 3
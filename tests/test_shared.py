@@ -0,0 +1,86 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+from src.leaky import LeaderLock, SharedCache
+
+
+async def test_workers_see_each_others_writes(tmp_path):
+    path = str(tmp_path / "shared.db")
+    writer = SharedCache(path)
+    reader = SharedCache(path)
+    writer.put("post:bafy", b"<p>body</p>")
+    writer.put_listing("blog", "bafy-blog", b"[]")
+    # Closing commits whatever's still queued
+    await asyncio.to_thread(writer.close)
+
+    assert await reader.get("post:bafy") == b"<p>body</p>"
+    assert await reader.get("post:other") is None
+    listing = await reader.listing("blog")
+    assert listing is not None and listing[:2] == ("bafy-blog", b"[]")
+    assert await reader.listing_versions() == {"blog": "bafy-blog"}
+    assert reader.stats()["hits"] == 1 and reader.stats()["misses"] == 1
+    await asyncio.to_thread(reader.close)
+
+
+async def test_the_oldest_blobs_are_trimmed_past_max_bytes(tmp_path):
+    path = str(tmp_path / "shared.db")
+    cache = SharedCache(path, max_bytes=100)
+    for i in range(10):
+        cache.put(f"blob:{i}", bytes(30))
+        time.sleep(0.002)
+    await asyncio.to_thread(cache.close)
+
+    cache = SharedCache(path, max_bytes=100)
+    # Counted from the file by the writer when it starts
+    async with asyncio.timeout(1):
+        while not cache.stats()["entries"]:
+            await asyncio.sleep(0.01)
+    assert cache.stats()["bytes"] <= 100
+    assert await cache.get("blob:0") is None
+    assert await cache.get("blob:9") == bytes(30)
+    await asyncio.to_thread(cache.close)
+
+
+def test_one_leader_at_a_time(tmp_path):
+    path = str(tmp_path / "shared.db.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+    assert first.acquire() and first.held
+    assert not second.acquire() and not second.held
+    # Asking again while leading doesn't give it up
+    assert first.acquire()
+
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_the_lock_passes_on_when_the_leader_dies(tmp_path):
+    path = str(tmp_path / "shared.db.lock")
+    leader = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import time\n"
+            "from src.leaky import LeaderLock\n"
+            f"lock = LeaderLock({path!r})\n"
+            "assert lock.acquire()\n"
+            "print('leading', flush=True)\n"
+            "time.sleep(60)\n",
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert leader.stdout is not None and leader.stdout.readline() == "leading\n"
+        follower = LeaderLock(path)
+        assert not follower.acquire()
+
+        leader.kill()
+        leader.wait()
+        assert follower.acquire()
+        follower.release()
+    finally:
+        leader.kill()
+        leader.wait()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from src.leaky import LeakyStore, Snapshot, write_snapshot
+
+LISTING = json.dumps(
+    [
+        {
+            "path": "/notes/post.md",
+            "cid": "bafy-post",
+            "is_dir": False,
+            "object": {
+                "created_at": [2024, 1, 1, 0, 0, 0, 0, 0, 0],
+                "properties": {"title": "Post", "description": ""},
+            },
+        }
+    ]
+).encode()
+
+
+def write(directory, body: bytes = b"<p>body</p>"):
+    return write_snapshot(
+        str(directory),
+        {"blog": ("bafy-blog", LISTING)},
+        {"bafy-post": body, "bafy-copy": body},
+    )
+
+
+def test_snapshots_round_trip(tmp_path):
+    manifest = write(tmp_path)
+    snapshot = Snapshot.open(str(tmp_path))
+    assert snapshot is not None
+    assert snapshot.listing("blog") == ("bafy-blog", LISTING)
+    assert snapshot.listing("music") is None
+    assert snapshot.content("bafy-post") == b"<p>body</p>"
+    # The same bytes are only stored once
+    assert len(manifest["blobs"]) == 2
+    assert snapshot.verify() == []
+    snapshot.close()
+
+
+def test_verify_finds_damaged_blobs(tmp_path):
+    manifest = write(tmp_path)
+    with open(tmp_path / manifest["pack"], "r+b") as f:
+        f.write(b"X")
+    snapshot = Snapshot.open(str(tmp_path))
+    assert snapshot is not None
+    assert len(snapshot.verify()) == 1
+    snapshot.close()
+
+
+def test_rewriting_replaces_the_old_pack(tmp_path):
+    first = write(tmp_path)
+    second = write(tmp_path, b"<p>edited</p>")
+    assert first["pack"] != second["pack"]
+    packs = [name for name in os.listdir(tmp_path) if name.endswith(".pack")]
+    assert packs == [second["pack"]]
+
+
+def test_unusable_snapshots_are_ignored(tmp_path):
+    assert Snapshot.open(str(tmp_path)) is None
+    (tmp_path / "manifest.json").write_text('{"format": 99}')
+    assert Snapshot.open(str(tmp_path)) is None
+    (tmp_path / "manifest.json").write_text("not json")
+    assert Snapshot.open(str(tmp_path)) is None
+
+
+async def test_restored_stores_serve_while_leaky_is_down(tmp_path):
+    write(tmp_path)
+    requests = []
+
+    def down(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(503)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(down))
+    store = LeakyStore("http://leaky", client)
+    snapshot = Snapshot.open(str(tmp_path))
+    assert snapshot is not None
+    await store.restore(snapshot, track_versions=True)
+
+    assert store.versions == {"blog": "bafy-blog"}
+    post = await store.post("notes", "post.md")
+    assert post is not None and post.content == "<p>body</p>"
+    assert requests == [] and not store.snapshot_dirty
+    await store.close()
+    await client.aclose()
+
+
+async def test_untracked_restores_are_refreshed_on_first_read(tmp_path):
+    write(tmp_path)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(200, content=LISTING)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    store = LeakyStore("http://leaky", client)
+    snapshot = Snapshot.open(str(tmp_path))
+    assert snapshot is not None
+    await store.restore(snapshot)
+
+    # Served from the snapshot straight away, and caught up in the background
+    assert (await store.blog()).version == "bafy-blog"
+    async with asyncio.timeout(1):
+        while store.cache.peek("blog").version == "bafy-blog":
+            await asyncio.sleep(0.01)
+    assert requests == ["/blog"]
+    await store.close()
+    await client.aclose()
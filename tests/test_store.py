@@ -0,0 +1,108 @@
+import json
+from typing import List
+
+import httpx
+import pytest
+
+from src.leaky import LeakyStore, Snapshot
+
+CID = "bafy-shared"
+
+
+def listing_item(path: str, title: str, tags):
+    return {
+        "path": path,
+        "cid": CID,
+        "is_dir": False,
+        "object": {
+            "created_at": [2024, 1, 1, 0, 0, 0, 0, 0, 0],
+            "properties": {"title": title, "description": "", "tags": tags},
+        },
+    }
+
+
+# Two posts with the same content, so the same CID
+LISTING = [
+    listing_item("/notes/post-1.md", "Post number 1", ["one"]),
+    listing_item("/drafts/post-2.md", "Post number 2", ["two"]),
+]
+
+
+def leaky(requests: List[str]) -> httpx.AsyncClient:
+    """A client for a leaky serving LISTING, recording the paths requested"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/blog":
+            return httpx.Response(200, content=json.dumps(LISTING))
+        return httpx.Response(200, text="<p>the same body</p>")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+async def store():
+    requests: List[str] = []
+    client = leaky(requests)
+    store = LeakyStore("http://leaky", client)
+    store.requests = requests  # type: ignore[attr-defined]
+    yield store
+    await store.close()
+    await client.aclose()
+
+
+async def test_posts_sharing_a_cid_keep_their_own_metadata(store):
+    first = await store.post("notes", "post-1.md")
+    second = await store.post("drafts", "post-2.md")
+
+    assert first is not None and second is not None
+    assert (first.path, first.title, first.tags) == (
+        "notes/post-1.md",
+        "Post number 1",
+        ["one"],
+    )
+    assert (second.path, second.title, second.tags) == (
+        "drafts/post-2.md",
+        "Post number 2",
+        ["two"],
+    )
+    # The body is only fetched once for the CID
+    assert first.content == second.content == "<p>the same body</p>"
+    assert store.requests.count("/blog/notes/post-1.md") == 1
+    assert "/blog/drafts/post-2.md" not in store.requests
+    assert len(store.content.keys()) == 1
+
+
+async def test_uncached_reads_leave_the_content_cache_alone(store):
+    post = await store.post("notes", "post-1.md", cache=False)
+    assert post is not None and post.content == "<p>the same body</p>"
+    assert store.content.keys() == []
+
+
+async def test_reads_without_upstream_only_use_what_we_have(store):
+    assert await store.post("notes", "post-1.md", upstream=False) is None
+    await store.post("notes", "post-1.md")
+    post = await store.post("drafts", "post-2.md", upstream=False)
+    assert post is not None and post.title == "Post number 2"
+
+
+async def test_uncached_reads_still_make_it_into_the_snapshot(tmp_path):
+    requests: List[str] = []
+    client = leaky(requests)
+    store = LeakyStore("http://leaky", client, snapshots=True)
+    await store.post("notes", "post-1.md", cache=False)
+    assert store.content.keys() == [] and store.snapshot_dirty
+    await store.save_snapshot(str(tmp_path))
+    await store.close()
+
+    # A restart reads the body from the snapshot rather than leaky
+    requests.clear()
+    restarted = LeakyStore("http://leaky", client, snapshots=True)
+    snapshot = Snapshot.open(str(tmp_path))
+    assert snapshot is not None
+    await restarted.restore(snapshot)
+    post = await restarted.post("drafts", "post-2.md", cache=False)
+    assert post is not None and post.content == "<p>the same body</p>"
+    assert requests == [] and not restarted.snapshot_dirty
+    await restarted.close()
+    await client.aclose()
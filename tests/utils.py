@@ -0,0 +1,29 @@
+"""Builders shared by the tests"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from src.leaky import BlogPost
+
+EPOCH = datetime(2024, 1, 1)
+
+
+def post(
+    name: str,
+    category: str = "thoughts",
+    days: int = 0,
+    title: Optional[str] = None,
+    cid: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    description: str = "",
+) -> BlogPost:
+    """A listed post, `days` after EPOCH"""
+    return BlogPost(
+        name=name,
+        category=category,
+        title=title or name,
+        description=description,
+        created_at=EPOCH + timedelta(days=days),
+        cid=cid,
+        tags=tags or [],
+    )